@@ -0,0 +1,118 @@
+"""Batch analysis: search every position of an EPD or FEN file on all cores.
+
+    python analyze.py puzzles.epd --depth 6
+    python analyze.py positions.fen --time 0.5 --output results.epd --workers 8
+
+The input is read one line at a time and at most --in-flight positions are
+queued for the process pool, so files of any size run in constant memory.
+Results are written as EPD in input order as soon as they are ready:
+
+    <position> bm <SAN>; ce <centipawns>; acd <depth>; acn <nodes>; id "<id>";
+
+ce is from the side to move's point of view. When the input carries a bm
+operation, the summary reports how many best moves were found.
+"""
+import argparse
+import collections
+import concurrent.futures
+import multiprocessing
+import os
+import sys
+import time
+
+import engine
+
+# ---------------- ANALYSIS ----------------
+def analyze_line(job):
+    """Search one EPD/FEN line in a pool process; returns (EPD output or None, solved, error)"""
+    line_number, line, depth, time_limit = job
+    try:
+        fen, operations = engine.parse_epd(line)
+        engine.load_fen(fen)
+    except ValueError as e:
+        return None, None, f"line {line_number}: {e}"
+
+    move = engine.search(time_limit, max_depth=depth)
+    if move is None:
+        engine.update_game_state()
+        return None, None, f"line {line_number}: no legal moves ({engine.game_state})"
+    info = engine.last_search
+    san = engine.move_san(move)
+
+    fields = " ".join(engine.to_fen().split()[:4])
+    output = f"{fields} bm {san}; ce {info['score']}; acd {info['depth']}; acn {info['nodes']};"
+    if "id" in operations:
+        output += f" id {operations['id']};"
+    solved = None
+    if "bm" in operations:
+        # Compare without check marks, which some puzzle files leave out
+        expected = {m.rstrip("+#") for m in operations["bm"].split()}
+        solved = san.rstrip("+#") in expected
+    return output, solved, None
+
+def read_jobs(f, depth, time_limit):
+    """Yield one job per non-blank, non-comment line without reading ahead"""
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line_number, line, depth, time_limit
+
+# ---------------- CLI ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Search every position in an EPD or FEN file")
+    parser.add_argument("input", help="EPD or FEN file, one position per line")
+    parser.add_argument("--depth", type=int, default=None, help="fixed search depth")
+    parser.add_argument("--time", type=float, default=None, help="seconds per position")
+    parser.add_argument("--output", help="write results here instead of standard output")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="processes to search in parallel (default: all cores)")
+    parser.add_argument("--in-flight", type=int, default=None,
+                        help="positions queued at once (default: 4 per worker)")
+    args = parser.parse_args()
+    if args.depth is None and args.time is None:
+        parser.error("give a --depth, a --time or both")
+    time_limit = args.time if args.time is not None else float("inf")
+    in_flight = args.in_flight or 4 * args.workers
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    count = errors = 0
+    tried = solved = 0
+    start = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    try:
+        with open(args.input) as f, concurrent.futures.ProcessPoolExecutor(args.workers, ctx) as pool:
+            pending = collections.deque()
+            jobs = read_jobs(f, args.depth, time_limit)
+            while True:
+                # Top up the queue, then write the oldest result once it is done
+                for job in jobs:
+                    pending.append(pool.submit(analyze_line, job))
+                    if len(pending) >= in_flight:
+                        break
+                if not pending:
+                    break
+                output, found, error = pending.popleft().result()
+                if error:
+                    errors += 1
+                    print(error, file=sys.stderr)
+                    continue
+                count += 1
+                out.write(output + "\n")
+                out.flush()
+                if found is not None:
+                    tried += 1
+                    solved += found
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    summary = f"Analyzed {count} positions in {elapsed:.1f}s"
+    if errors:
+        summary += f", {errors} skipped"
+    if tried:
+        summary += f", best move found in {solved}/{tried}"
+    print(summary, file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Score many positions at once with NumPy: material, piece-square tables and phase.
+
+    python batch_eval.py positions.fen                    # summary and speed
+    python batch_eval.py games.epd --output scores.txt    # one score per line
+    python batch_eval.py --verify 5000                    # cross-check against engine.evaluate()
+
+NumPy is only needed for this module; the game and engine run without it.
+Positions are encoded either as planes, an N x 12 x 64 array of 0/1 with
+one plane per piece in bitboard.PIECES order, or compactly as squares, an
+N x 64 array of piece numbers (0 = empty, i + 1 = PIECES[i]). Both give
+exactly engine.evaluate() for every position: centipawns, positive when
+Black is better.
+
+    import batch_eval
+    squares = batch_eval.encode_fens(fens)
+    scores = batch_eval.evaluate_squares(squares)
+"""
+import argparse
+import itertools
+import random
+import sys
+import time
+
+import numpy as np
+
+import bitboard
+import engine
+
+# Row 0 of each table is the empty square
+PST_MG = np.array([[0] * 64] + [engine.PST_MG[p] for p in bitboard.PIECES], dtype=np.int32)
+PST_EG = np.array([[0] * 64] + [engine.PST_EG[p] for p in bitboard.PIECES], dtype=np.int32)
+PHASE = np.array([0] + [engine.PHASE[p] for p in bitboard.PIECES], dtype=np.int32)
+
+# FEN placement byte -> piece number; 255 marks bytes that are not pieces
+FEN_PIECES = np.full(256, 255, dtype=np.uint8)
+FEN_PIECES[ord(".")] = 0
+for i, piece in enumerate(bitboard.PIECES):
+    FEN_PIECES[ord(piece[1].upper() if piece[0] == "w" else piece[1])] = i + 1
+
+# ---------------- ENCODING ----------------
+def encode_fens(fens):
+    """N x 64 piece numbers for an iterable of FEN or EPD strings (only the placement is read)"""
+    placements = [fen.partition(" ")[0] for fen in fens]
+    raw = np.frombuffer(("\n".join(placements) + "\n").encode("ascii", "replace"), dtype=np.uint8)
+    # Expand all placements at once: digit n becomes n empty squares, "/" disappears
+    digits = (raw >= ord("1")) & (raw <= ord("8"))
+    counts = np.where(digits, raw - ord("0"), 1)
+    counts[raw == ord("/")] = 0
+    text = np.repeat(np.where(digits, ord("."), raw).astype(np.uint8), counts)
+    # Each placement must now be exactly 64 squares followed by its newline
+    if len(text) != 65 * len(placements) or (text[64::65] != ord("\n")).any():
+        raise ValueError(f"Bad FEN placement in {_first_bad(placements)!r}")
+    squares = FEN_PIECES[text.reshape(-1, 65)[:, :64]]
+    if (squares == 255).any():
+        raise ValueError(f"Bad FEN placement in {_first_bad(placements)!r}")
+    return squares
+
+def _first_bad(placements):
+    for p in placements:
+        try:
+            encode_boards([engine.parse_placement(p)])
+        except ValueError:
+            return p
+
+def encode_boards(boards):
+    """N x 64 piece numbers for engine-style 8 x 8 boards"""
+    numbers = {"": 0, **{p: i + 1 for i, p in enumerate(bitboard.PIECES)}}
+    return np.array([[numbers[piece] for row in b for piece in row] for b in boards],
+                    dtype=np.uint8).reshape(-1, 64)
+
+def to_planes(squares):
+    """N x 12 x 64 one-hot piece planes from N x 64 piece numbers"""
+    return (squares[:, None, :] == np.arange(1, 13, dtype=np.uint8)[None, :, None]).astype(np.uint8)
+
+# ---------------- EVALUATION ----------------
+def taper(mg, eg, phase):
+    phase = np.minimum(phase, engine.MAX_PHASE)
+    return (mg * phase + eg * (engine.MAX_PHASE - phase)) // engine.MAX_PHASE
+
+def evaluate_squares(squares):
+    """engine.evaluate() for every row of an N x 64 piece-number array"""
+    index = squares.astype(np.intp)
+    cols = np.arange(64)
+    mg = PST_MG[index, cols].sum(axis=1, dtype=np.int64)
+    eg = PST_EG[index, cols].sum(axis=1, dtype=np.int64)
+    return taper(mg, eg, PHASE[index].sum(axis=1, dtype=np.int64))
+
+def to_squares(planes):
+    """N x 64 piece numbers from N x 12 x 64 planes"""
+    return np.einsum("npq,p->nq", planes, np.arange(1, 13, dtype=np.uint8))
+
+def evaluate_planes(planes):
+    """engine.evaluate() for every position of an N x 12 x 64 plane array"""
+    # Integer matrix products have no BLAS path, so gather from the tables instead
+    return evaluate_squares(to_squares(planes))
+
+# ---------------- VERIFICATION ----------------
+def random_positions(count, seed=0):
+    """(FENs, engine.evaluate() scores) of count positions from random playouts"""
+    rng = random.Random(seed)
+    fens, scores = [], []
+    while len(fens) < count:
+        engine.load_fen(engine.START_FEN)
+        for _ in range(rng.randrange(10, 160)):
+            moves = engine.get_moves("w" if engine.turn == "white" else "b")
+            if not moves or len(fens) == count:
+                break
+            engine.make_move(rng.choice(moves))
+            fens.append(engine.to_fen())
+            scores.append(engine.evaluate())
+    return fens, scores
+
+def verify(count, seed=0):
+    """Number of positions where a batch path disagrees with engine.evaluate()"""
+    fens, expected = random_positions(count, seed)
+    expected = np.array(expected, dtype=np.int64)
+    squares = encode_fens(fens)
+    mismatches = 0
+    for name, scores in (("squares", evaluate_squares(squares)),
+                         ("planes", evaluate_planes(to_planes(squares)))):
+        bad = np.flatnonzero(scores != expected)
+        for i in bad[:5]:
+            print(f"{name}: {fens[i]} scores {scores[i]}, engine {expected[i]}", file=sys.stderr)
+        mismatches += len(bad)
+    return mismatches
+
+# ---------------- CLI ----------------
+def read_chunks(f, size):
+    """Lists of up to size non-blank, non-comment lines"""
+    lines = (line for line in f if line.strip() and not line.startswith("#"))
+    while True:
+        chunk = list(itertools.islice(lines, size))
+        if not chunk:
+            return
+        yield chunk
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate every position of a FEN/EPD file with NumPy")
+    parser.add_argument("input", nargs="?", help="FEN or EPD file, one position per line")
+    parser.add_argument("--output", help="write one score per line (centipawns, positive for Black)")
+    parser.add_argument("--chunk", type=int, default=100000, help="positions encoded at a time")
+    parser.add_argument("--verify", type=int, metavar="N",
+                        help="compare with engine.evaluate() on N random-playout positions instead")
+    args = parser.parse_args()
+    if args.verify:
+        mismatches = verify(args.verify)
+        print(f"{mismatches} mismatches in {args.verify:,} positions", file=sys.stderr)
+        sys.exit(1 if mismatches else 0)
+    if args.input is None:
+        parser.error("give an input file or --verify")
+
+    out = open(args.output, "w") if args.output else None
+    count = total = 0
+    start = time.perf_counter()
+    with open(args.input) as f:
+        for chunk in read_chunks(f, args.chunk):
+            scores = evaluate_squares(encode_fens(chunk))
+            count += len(scores)
+            total += int(scores.sum())
+            if out:
+                out.write("\n".join(map(str, scores.tolist())) + "\n")
+    if out:
+        out.close()
+    elapsed = time.perf_counter() - start
+    mean = total / count if count else 0
+    print(f"Evaluated {count:,} positions in {elapsed:.2f}s "
+          f"({count / elapsed if elapsed else 0:,.0f}/s), mean score {mean:.1f}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,523 @@
+"""Bitboard position representation for engine work.
+
+Squares are numbered like the GUI board: square = row * 8 + col, so a8 is 0
+and h1 is 63. Each piece type and color gets one 64-bit integer.
+"""
+
+# ---------------- PIECES ----------------
+PIECES = ["wp", "wn", "wb", "wr", "wq", "wk", "bp", "bn", "bb", "br", "bq", "bk"]
+PIECE_INDEX = {p: i for i, p in enumerate(PIECES)}
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+
+# Castling rights bits, same layout as castling_rights in main.py
+CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ = 1, 2, 4, 8
+ALL = (1 << 64) - 1
+
+# ---------------- ATTACK TABLES ----------------
+def _on_board(r, c):
+    return 0 <= r < 8 and 0 <= c < 8
+
+def _offset_table(offsets):
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        mask = 0
+        for dr, dc in offsets:
+            if _on_board(r + dr, c + dc):
+                mask |= 1 << ((r + dr) * 8 + c + dc)
+        table.append(mask)
+    return table
+
+KNIGHT_ATTACKS = _offset_table([(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)])
+KING_ATTACKS = _offset_table([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)])
+# White pawns move towards row 0, black pawns towards row 7
+PAWN_ATTACKS = [_offset_table([(-1, -1), (-1, 1)]), _offset_table([(1, -1), (1, 1)])]
+
+ROOK_DIRS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+BISHOP_DIRS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+def _ray_table(dr, dc):
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        mask = 0
+        r, c = r + dr, c + dc
+        while _on_board(r, c):
+            mask |= 1 << (r * 8 + c)
+            r, c = r + dr, c + dc
+        table.append(mask)
+    return table
+
+# Each entry: (ray table, True if the ray runs towards higher square numbers)
+ROOK_RAYS = [(_ray_table(dr, dc), dr * 8 + dc > 0) for dr, dc in ROOK_DIRS]
+BISHOP_RAYS = [(_ray_table(dr, dc), dr * 8 + dc > 0) for dr, dc in BISHOP_DIRS]
+
+def _between_table():
+    table = [[0] * 64 for _ in range(64)]
+    for rays in (ROOK_RAYS, BISHOP_RAYS):
+        for ray, _ in rays:
+            for a in range(64):
+                bits = ray[a]
+                while bits:
+                    b = (bits & -bits).bit_length() - 1
+                    table[a][b] = ray[a] & ~ray[b] & ~(1 << b)
+                    bits &= bits - 1
+    return table
+
+# Squares strictly between two aligned squares, 0 when not aligned or adjacent
+BETWEEN = _between_table()
+
+def _slider_attacks(sq, occupied, rays):
+    attacks = 0
+    for ray, positive in rays:
+        mask = ray[sq]
+        blockers = mask & occupied
+        if blockers:
+            if positive:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            mask ^= ray[first]
+        attacks |= mask
+    return attacks
+
+def rook_attacks(sq, occupied):
+    return _slider_attacks(sq, occupied, ROOK_RAYS)
+
+def bishop_attacks(sq, occupied):
+    return _slider_attacks(sq, occupied, BISHOP_RAYS)
+
+def queen_attacks(sq, occupied):
+    return _slider_attacks(sq, occupied, ROOK_RAYS) | _slider_attacks(sq, occupied, BISHOP_RAYS)
+
+# Everything a rook or bishop on each square would see on an empty board
+ROOK_LINES = [rook_attacks(sq, 0) for sq in range(64)]
+BISHOP_LINES = [bishop_attacks(sq, 0) for sq in range(64)]
+
+def squares(bits):
+    """Yield the square numbers set in bits, lowest first"""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+# ---------------- POSITION ----------------
+class Bitboards:
+    """One bitboard per piece plus side to move, castling bits and en passant square"""
+    __slots__ = ("pieces", "occupied", "side", "castling", "ep")
+
+    def __init__(self, pieces, side=WHITE, castling=15, ep=-1):
+        self.pieces = pieces
+        self.occupied = [pieces[0] | pieces[1] | pieces[2] | pieces[3] | pieces[4] | pieces[5],
+                         pieces[6] | pieces[7] | pieces[8] | pieces[9] | pieces[10] | pieces[11]]
+        self.side = side
+        self.castling = castling
+        self.ep = ep
+
+    def copy(self):
+        pos = Bitboards.__new__(Bitboards)
+        pos.pieces = self.pieces[:]
+        pos.occupied = self.occupied[:]
+        pos.side = self.side
+        pos.castling = self.castling
+        pos.ep = self.ep
+        return pos
+
+    def piece_at(self, sq):
+        bit = 1 << sq
+        if not (self.occupied[0] | self.occupied[1]) & bit:
+            return ""
+        for i, bits in enumerate(self.pieces):
+            if bits & bit:
+                return PIECES[i]
+        return ""
+
+def from_board(board, turn="white", castling_rights=15, en_passant_target=None):
+    """Build bitboards from the GUI's 8x8 list of piece strings and state globals"""
+    pieces = [0] * 12
+    for r in range(8):
+        for c in range(8):
+            if board[r][c]:
+                pieces[PIECE_INDEX[board[r][c]]] |= 1 << (r * 8 + c)
+    ep = en_passant_target[0] * 8 + en_passant_target[1] if en_passant_target else -1
+    return Bitboards(pieces, WHITE if turn == "white" else BLACK, castling_rights, ep)
+
+def to_board(pos):
+    """Convert back to the 8x8 list layout used by the pygame renderer"""
+    board = [[""] * 8 for _ in range(8)]
+    for i, bits in enumerate(pos.pieces):
+        for sq in squares(bits):
+            board[sq >> 3][sq & 7] = PIECES[i]
+    return board
+
+# ---------------- ATTACKS ----------------
+def find_king(pos, color):
+    """Square of the king of color (WHITE/BLACK), or -1"""
+    bits = pos.pieces[color * 6 + KING]
+    return (bits & -bits).bit_length() - 1
+
+def attackers_to(pos, sq, by, occupied=None):
+    """Bitboard of pieces of color by attacking sq"""
+    if occupied is None:
+        occupied = pos.occupied[0] | pos.occupied[1]
+    p = pos.pieces
+    base = by * 6
+    queens = p[base + QUEEN]
+    return ((PAWN_ATTACKS[by ^ 1][sq] & p[base + PAWN]) |
+            (KNIGHT_ATTACKS[sq] & p[base + KNIGHT]) |
+            (KING_ATTACKS[sq] & p[base + KING]) |
+            (bishop_attacks(sq, occupied) & (p[base + BISHOP] | queens)) |
+            (rook_attacks(sq, occupied) & (p[base + ROOK] | queens)))
+
+def is_square_attacked(pos, sq, by, occupied=None):
+    p = pos.pieces
+    base = by * 6
+    if PAWN_ATTACKS[by ^ 1][sq] & p[base + PAWN]:
+        return True
+    if KNIGHT_ATTACKS[sq] & p[base + KNIGHT]:
+        return True
+    if KING_ATTACKS[sq] & p[base + KING]:
+        return True
+    if occupied is None:
+        occupied = pos.occupied[0] | pos.occupied[1]
+    queens = p[base + QUEEN]
+    if bishop_attacks(sq, occupied) & (p[base + BISHOP] | queens):
+        return True
+    return bool(rook_attacks(sq, occupied) & (p[base + ROOK] | queens))
+
+def is_in_check(pos, color):
+    king = find_king(pos, color)
+    return king >= 0 and is_square_attacked(pos, king, color ^ 1)
+
+def path_clear(pos, start, end):
+    """True when no piece stands strictly between two aligned squares"""
+    return not BETWEEN[start][end] & (pos.occupied[0] | pos.occupied[1])
+
+# ---------------- MOVES ----------------
+# A move is packed as from | to << 6 | flag << 12
+FLAG_NONE, FLAG_DOUBLE, FLAG_EP, FLAG_CASTLE, FLAG_PROMO = 0, 1, 2, 3, 4
+
+def encode(frm, to, flag=FLAG_NONE):
+    return frm | to << 6 | flag << 12
+
+def move_coords(move):
+    """Unpack a move into the GUI's (sr, sc, er, ec) tuple"""
+    frm, to = move & 63, (move >> 6) & 63
+    return (frm >> 3, frm & 7, to >> 3, to & 7)
+
+# Squares that must be empty / not attacked for each castle, and the rook hop
+_CASTLES = [
+    (CASTLE_WK, 60, 62, (61, 62), (61, 62), 63, 61),
+    (CASTLE_WQ, 60, 58, (57, 58, 59), (59, 58), 56, 59),
+    (CASTLE_BK, 4, 6, (5, 6), (5, 6), 7, 5),
+    (CASTLE_BQ, 4, 2, (1, 2, 3), (3, 2), 0, 3),
+]
+# Castling rights that survive a move touching each square
+_RIGHTS_MASK = [15] * 64
+_RIGHTS_MASK[60] = 15 & ~(CASTLE_WK | CASTLE_WQ)
+_RIGHTS_MASK[63] = 15 & ~CASTLE_WK
+_RIGHTS_MASK[56] = 15 & ~CASTLE_WQ
+_RIGHTS_MASK[4] = 15 & ~(CASTLE_BK | CASTLE_BQ)
+_RIGHTS_MASK[7] = 15 & ~CASTLE_BK
+_RIGHTS_MASK[0] = 15 & ~CASTLE_BQ
+# Rook from and to squares, keyed by the king's castling destination
+_ROOK_HOPS = {to: (1 << rook_from) | (1 << rook_to) for _, _, to, _, _, rook_from, rook_to in _CASTLES}
+
+ROW_MASKS = [0xFF << (8 * r) for r in range(8)]
+
+def can_castle(pos, castle, king):
+    """True when the side to move, king on king, may make castle (an entry of _CASTLES)"""
+    right, frm, _, empties, safe, rook_from, _ = castle
+    if not pos.castling & right or frm != king or not pos.pieces[pos.side * 6 + ROOK] >> rook_from & 1:
+        return False
+    occupied = pos.occupied[0] | pos.occupied[1]
+    them = pos.side ^ 1
+    return (not any(occupied >> sq & 1 for sq in empties) and
+            not is_square_attacked(pos, frm, them, occupied) and
+            not any(is_square_attacked(pos, sq, them, occupied) for sq in safe))
+
+def generate_moves(pos):
+    """Pseudo-legal moves for the side to move as packed ints"""
+    side = pos.side
+    them = side ^ 1
+    p = pos.pieces
+    own = pos.occupied[side]
+    enemy = pos.occupied[them]
+    occupied = own | enemy
+    empty = ~occupied & ALL
+    base = side * 6
+    moves = []
+    append = moves.append
+
+    # Pawns
+    pawns = p[base + PAWN]
+    if side == WHITE:
+        push = (pawns >> 8) & empty
+        double = ((push & ROW_MASKS[5]) >> 8) & empty
+        step = -8
+        promo_row = ROW_MASKS[0]
+    else:
+        push = (pawns << 8) & empty
+        double = ((push & ROW_MASKS[2]) << 8) & empty
+        step = 8
+        promo_row = ROW_MASKS[7]
+    for to in squares(push):
+        append(to - step | to << 6 | (FLAG_PROMO if (1 << to) & promo_row else 0) << 12)
+    for to in squares(double):
+        append(to - 2 * step | to << 6 | FLAG_DOUBLE << 12)
+    pawn_attacks = PAWN_ATTACKS[side]
+    ep_bit = 1 << pos.ep if pos.ep >= 0 else 0
+    for frm in squares(pawns):
+        targets = pawn_attacks[frm]
+        for to in squares(targets & enemy):
+            append(frm | to << 6 | (FLAG_PROMO if (1 << to) & promo_row else 0) << 12)
+        if targets & ep_bit:
+            append(frm | pos.ep << 6 | FLAG_EP << 12)
+
+    # Pieces
+    not_own = ~own & ALL
+    for frm in squares(p[base + KNIGHT]):
+        for to in squares(KNIGHT_ATTACKS[frm] & not_own):
+            append(frm | to << 6)
+    for frm in squares(p[base + BISHOP]):
+        for to in squares(bishop_attacks(frm, occupied) & not_own):
+            append(frm | to << 6)
+    for frm in squares(p[base + ROOK]):
+        for to in squares(rook_attacks(frm, occupied) & not_own):
+            append(frm | to << 6)
+    for frm in squares(p[base + QUEEN]):
+        for to in squares(queen_attacks(frm, occupied) & not_own):
+            append(frm | to << 6)
+    king = find_king(pos, side)
+    if king >= 0:
+        for to in squares(KING_ATTACKS[king] & not_own):
+            append(king | to << 6)
+
+        # Castling
+        for castle in _CASTLES:
+            if can_castle(pos, castle, king):
+                append(king | castle[2] << 6 | FLAG_CASTLE << 12)
+    return moves
+
+def do_move(pos, move):
+    """Play move on pos in place (pawns promote to queen); return the undo record"""
+    frm, to, flag = move & 63, (move >> 6) & 63, move >> 12
+    side = pos.side
+    them = side ^ 1
+    p = pos.pieces
+    occ = pos.occupied
+    from_bit, to_bit = 1 << frm, 1 << to
+
+    captured = -1
+    if occ[them] & to_bit:
+        for i in range(them * 6, them * 6 + 6):
+            if p[i] & to_bit:
+                p[i] ^= to_bit
+                captured = i
+                break
+        occ[them] ^= to_bit
+
+    for i in range(side * 6, side * 6 + 6):
+        if p[i] & from_bit:
+            moved = i
+            break
+    p[moved] ^= from_bit
+    p[side * 6 + QUEEN if flag == FLAG_PROMO else moved] |= to_bit
+    occ[side] ^= from_bit | to_bit
+
+    if flag == FLAG_EP:
+        taken = 1 << (to + (8 if side == WHITE else -8))
+        p[them * 6 + PAWN] ^= taken
+        occ[them] ^= taken
+    elif flag == FLAG_CASTLE:
+        hop = _ROOK_HOPS[to]
+        p[side * 6 + ROOK] ^= hop
+        occ[side] ^= hop
+
+    undo = (moved, captured, pos.castling, pos.ep)
+    pos.ep = (frm + to) >> 1 if flag == FLAG_DOUBLE else -1
+    pos.castling &= _RIGHTS_MASK[frm] & _RIGHTS_MASK[to]
+    pos.side = them
+    return undo
+
+def undo_move(pos, move, undo):
+    """Take back move played by do_move"""
+    frm, to, flag = move & 63, (move >> 6) & 63, move >> 12
+    moved, captured, pos.castling, pos.ep = undo
+    them = pos.side
+    side = pos.side = them ^ 1
+    p = pos.pieces
+    occ = pos.occupied
+    from_bit, to_bit = 1 << frm, 1 << to
+
+    p[side * 6 + QUEEN if flag == FLAG_PROMO else moved] ^= to_bit
+    p[moved] |= from_bit
+    occ[side] ^= from_bit | to_bit
+    if captured >= 0:
+        p[captured] |= to_bit
+        occ[them] |= to_bit
+
+    if flag == FLAG_EP:
+        taken = 1 << (to + (8 if side == WHITE else -8))
+        p[them * 6 + PAWN] |= taken
+        occ[them] |= taken
+    elif flag == FLAG_CASTLE:
+        hop = _ROOK_HOPS[to]
+        p[side * 6 + ROOK] ^= hop
+        occ[side] ^= hop
+
+def make_move(pos, move):
+    """Return a new position with move played, leaving pos untouched"""
+    new = pos.copy()
+    do_move(new, move)
+    return new
+
+def pinned_pieces(pos, king, side):
+    """Map each pinned piece of side to the squares it may move to without exposing the king"""
+    p = pos.pieces
+    base = (side ^ 1) * 6
+    queens = p[base + QUEEN]
+    snipers = ((ROOK_LINES[king] & (p[base + ROOK] | queens)) |
+               (BISHOP_LINES[king] & (p[base + BISHOP] | queens)))
+    occupied = pos.occupied[0] | pos.occupied[1]
+    own = pos.occupied[side]
+    pins = {}
+    for sq in squares(snipers):
+        blockers = BETWEEN[king][sq] & occupied
+        if blockers & own and not blockers & (blockers - 1):
+            pins[blockers.bit_length() - 1] = BETWEEN[king][sq] | 1 << sq
+    return pins
+
+def legal_moves(pos):
+    """Legal moves for the side to move, using check and pin masks instead of trying each move"""
+    side = pos.side
+    king = find_king(pos, side)
+    if king < 0:
+        return generate_moves(pos)
+    them = side ^ 1
+    p = pos.pieces
+    own = pos.occupied[side]
+    enemy = pos.occupied[them]
+    occupied = own | enemy
+    not_own = ~own & ALL
+    base = side * 6
+    moves = []
+    append = moves.append
+
+    # King: the destination must stay unattacked once the king has left its square
+    without_king = occupied ^ (1 << king)
+    for to in squares(KING_ATTACKS[king] & not_own):
+        if not is_square_attacked(pos, to, them, without_king):
+            append(king | to << 6)
+    checkers = attackers_to(pos, king, them)
+    if checkers & (checkers - 1):
+        return moves
+
+    # Other pieces must capture a lone checker or block it
+    if checkers:
+        target = (checkers | BETWEEN[king][checkers.bit_length() - 1]) & not_own
+    else:
+        target = not_own
+        for castle in _CASTLES:
+            if can_castle(pos, castle, king):
+                append(king | castle[2] << 6 | FLAG_CASTLE << 12)
+    pins = pinned_pieces(pos, king, side)
+
+    # Pawns
+    pawns = p[base + PAWN]
+    empty = ~occupied & ALL
+    if side == WHITE:
+        push = (pawns >> 8) & empty
+        double = ((push & ROW_MASKS[5]) >> 8) & empty
+        step = -8
+        promo_row = ROW_MASKS[0]
+    else:
+        push = (pawns << 8) & empty
+        double = ((push & ROW_MASKS[2]) << 8) & empty
+        step = 8
+        promo_row = ROW_MASKS[7]
+    for to in squares(push & target):
+        frm = to - step
+        if frm not in pins or pins[frm] >> to & 1:
+            append(frm | to << 6 | (FLAG_PROMO if (1 << to) & promo_row else 0) << 12)
+    for to in squares(double & target):
+        frm = to - 2 * step
+        if frm not in pins or pins[frm] >> to & 1:
+            append(frm | to << 6 | FLAG_DOUBLE << 12)
+    pawn_attacks = PAWN_ATTACKS[side]
+    for frm in squares(pawns):
+        targets = pawn_attacks[frm] & enemy & target
+        if frm in pins:
+            targets &= pins[frm]
+        for to in squares(targets):
+            append(frm | to << 6 | (FLAG_PROMO if (1 << to) & promo_row else 0) << 12)
+    if pos.ep >= 0:
+        # En passant empties two squares on one rank, which masks cannot see: play it and look
+        for frm in squares(PAWN_ATTACKS[them][pos.ep] & pawns):
+            move = frm | pos.ep << 6 | FLAG_EP << 12
+            undo = do_move(pos, move)
+            if not is_square_attacked(pos, king, them):
+                append(move)
+            undo_move(pos, move, undo)
+
+    # Pieces: a pinned knight can never move, other pinned pieces stay on the pin line
+    for frm in squares(p[base + KNIGHT]):
+        if frm not in pins:
+            for to in squares(KNIGHT_ATTACKS[frm] & target):
+                append(frm | to << 6)
+    for index, attacks in ((BISHOP, bishop_attacks), (ROOK, rook_attacks), (QUEEN, queen_attacks)):
+        for frm in squares(p[base + index]):
+            targets = attacks(frm, occupied) & target
+            if frm in pins:
+                targets &= pins[frm]
+            for to in squares(targets):
+                append(frm | to << 6)
+    return moves
+
+def valid_move_without_check(pos, sr, sc, er, ec):
+    """Pseudo-legal test for a (sr, sc, er, ec) move by the side to move"""
+    frm, to = sr * 8 + sc, er * 8 + ec
+    side = pos.side
+    own = pos.occupied[side]
+    from_bit, to_bit = 1 << frm, 1 << to
+    if not own & from_bit or own & to_bit:
+        return False
+    p = pos.pieces
+    base = side * 6
+    occupied = own | pos.occupied[side ^ 1]
+    if p[base + PAWN] & from_bit:
+        if PAWN_ATTACKS[side][frm] & to_bit:
+            return bool(pos.occupied[side ^ 1] & to_bit) or to == pos.ep
+        step = -8 if side == WHITE else 8
+        if to == frm + step:
+            return not occupied & to_bit
+        return (to == frm + 2 * step and frm >> 3 == (6 if side == WHITE else 1) and
+                not occupied & (1 << (frm + step) | to_bit))
+    if p[base + KNIGHT] & from_bit:
+        return bool(KNIGHT_ATTACKS[frm] & to_bit)
+    if p[base + KING] & from_bit:
+        if KING_ATTACKS[frm] & to_bit:
+            return True
+        return any(castle[2] == to and can_castle(pos, castle, frm) for castle in _CASTLES)
+    if p[base + BISHOP] & from_bit:
+        lines = BISHOP_LINES[frm]
+    elif p[base + ROOK] & from_bit:
+        lines = ROOK_LINES[frm]
+    else:
+        lines = ROOK_LINES[frm] | BISHOP_LINES[frm]
+    return bool(lines & to_bit) and not BETWEEN[frm][to] & occupied
+
+def perft(pos, depth):
+    """Count leaf nodes of the legal move tree to depth, making moves in place"""
+    if depth == 0:
+        return 1
+    moves = legal_moves(pos)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for m in moves:
+        undo = do_move(pos, m)
+        nodes += perft(pos, depth - 1)
+        undo_move(pos, m, undo)
+    return nodes
@@ -0,0 +1,196 @@
+"""Opening book: a memory-mapped, sorted file of (position hash, move, weight) entries.
+
+    python book.py build book.bin games.pgn [more.pgn ...] --plies 20
+    python book.py probe book.bin [--fen "<FEN>"]
+
+Entries use Polyglot's 16-byte big-endian layout (key, move, weight,
+learn), sorted by key, with moves encoded the Polyglot way: castling as
+king-takes-rook and rows counted from rank 1. The key is this engine's
+Zobrist position_hash, not Polyglot's, so books must be built with this
+script. Lookups binary-search the mapped file, so opening even a large
+book costs no time or memory up front.
+
+    import book
+    book.use_book("book.bin")   # engine.choose_move() now plays book moves first
+"""
+import argparse
+import mmap
+import os
+import random
+import re
+import struct
+import sys
+
+import engine
+
+ENTRY = struct.Struct(">QHHI")  # key, move, weight, learn
+MAX_WEIGHT = 0xFFFF
+
+# ---------------- MOVE ENCODING ----------------
+def encode_move(move):
+    """Polyglot move bits for a legal (sr, sc, er, ec) move in the current position"""
+    sr, sc, er, ec = move
+    piece = engine.board[sr][sc]
+    if piece[1] == "k" and ec - sc in (2, -2):
+        ec = 7 if ec > sc else 0  # King takes own rook
+    promotion = 4 if piece[1] == "p" and er in (0, 7) else 0  # Always a queen
+    return promotion << 12 | (7 - sr) << 9 | sc << 6 | (7 - er) << 3 | ec
+
+def decode_move(bits):
+    """(sr, sc, er, ec) for Polyglot move bits in the current position"""
+    sr, sc = 7 - (bits >> 9 & 7), bits >> 6 & 7
+    er, ec = 7 - (bits >> 3 & 7), bits & 7
+    piece = engine.board[sr][sc]
+    if piece and piece[1] == "k" and sc == 4 and engine.board[er][ec] == piece[0] + "r":
+        ec = 6 if ec == 7 else 2
+    return (sr, sc, er, ec)
+
+# ---------------- LOOKUP ----------------
+class Book:
+    """Read-only view of a book file; entries are found by binary search"""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size % ENTRY.size:
+            self.file.close()
+            raise ValueError(f"{path} is not a book file: size {size} is not a multiple of {ENTRY.size}")
+        # An empty file cannot be mapped
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.count = size // ENTRY.size
+
+    def __len__(self):
+        return self.count
+
+    def entries(self, key):
+        """[(move bits, weight), ...] stored for a position hash"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if ENTRY.unpack_from(self.data, mid * ENTRY.size)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        found = []
+        while lo < self.count:
+            entry_key, bits, weight, _ = ENTRY.unpack_from(self.data, lo * ENTRY.size)
+            if entry_key != key:
+                break
+            found.append((bits, weight))
+            lo += 1
+        return found
+
+    def choose(self):
+        """Weighted random book move for the current engine position, or None"""
+        legal = engine.position_info()["moves"]
+        candidates, weights = [], []
+        for bits, weight in self.entries(engine.position_hash):
+            move = decode_move(bits)
+            if weight and move in legal:
+                candidates.append(move)
+                weights.append(weight)
+        if not candidates:
+            return None
+        return random.choices(candidates, weights)[0]
+
+    def close(self):
+        if self.count:
+            self.data.close()
+        self.file.close()
+
+def use_book(path):
+    """Install the book at path for engine.choose_move(); None removes it"""
+    if engine.opening_book is not None:
+        engine.opening_book.close()
+    engine.opening_book = Book(path) if path else None
+
+# ---------------- BUILDING ----------------
+def read_pgn_games(f):
+    """Yield (SAN moves, result) for each game of a PGN file, one game at a time"""
+    moves, result = [], "*"
+    in_moves = False
+    for line in f:
+        line = line.strip()
+        if line.startswith("["):
+            if in_moves:
+                yield moves, result
+                moves, result, in_moves = [], "*", False
+            if line.startswith("[Result "):
+                result = line.split('"')[1]
+            continue
+        line = re.sub(r"\{[^}]*\}", "", line)  # Comments
+        if not line or line.startswith(";"):
+            continue
+        in_moves = True
+        for token in line.split():
+            if token in ("1-0", "0-1", "1/2-1/2", "*"):
+                result = token
+            elif not token[0].isdigit() and not token.startswith("$"):
+                moves.append(token)
+            elif "." in token and not token.endswith("."):
+                moves.append(token.split(".")[-1])  # "12.Nf3"
+    if in_moves:
+        yield moves, result
+
+def build_book(pgn_paths, out_path, max_plies=20):
+    """Write a book of the first max_plies moves of every game; return (games, entries).
+
+    A move earns 2 points each time the side that played it went on to win,
+    1 for a draw or unknown result and 0 for a loss. Moves that never
+    earned a point are left out.
+    """
+    weights = {}
+    games = 0
+    for path in pgn_paths:
+        with open(path) as f:
+            for moves, result in read_pgn_games(f):
+                engine.load_fen(engine.START_FEN)
+                points = {"1-0": (2, 0), "0-1": (0, 2)}.get(result, (1, 1))
+                for ply, san in enumerate(moves[:max_plies]):
+                    try:
+                        move = engine.parse_san(san)
+                    except ValueError:
+                        break  # Keep the moves before an unreadable one
+                    key = (engine.position_hash, encode_move(move))
+                    weights[key] = weights.get(key, 0) + points[ply % 2]
+                    engine.make_move(move)
+                games += 1
+
+    entries = sorted((key, bits, min(weight, MAX_WEIGHT))
+                     for (key, bits), weight in weights.items() if weight)
+    with open(out_path, "wb") as out:
+        for key, bits, weight in entries:
+            out.write(ENTRY.pack(key, bits, weight, 0))
+    return games, len(entries)
+
+# ---------------- CLI ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect an opening book")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build a book from PGN games")
+    build.add_argument("book")
+    build.add_argument("pgn", nargs="+")
+    build.add_argument("--plies", type=int, default=20, help="half-moves of each game to use (default 20)")
+    probe = commands.add_parser("probe", help="list the book moves of a position")
+    probe.add_argument("book")
+    probe.add_argument("--fen", default=engine.START_FEN)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        games, count = build_book(args.pgn, args.book, args.plies)
+        print(f"{count} entries from {games} games written to {args.book}")
+        return
+
+    engine.load_fen(args.fen)
+    book = Book(args.book)
+    entries = book.entries(engine.position_hash)
+    if not entries:
+        print("Position not in book")
+        sys.exit(1)
+    total = sum(weight for _, weight in entries)
+    for bits, weight in sorted(entries, key=lambda e: -e[1]):
+        print(f"{engine.move_san(decode_move(bits)):8} {weight:6} {100 * weight / total:5.1f}%")
+    book.close()
+
+if __name__ == "__main__":
+    main()
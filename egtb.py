@@ -0,0 +1,339 @@
+"""Endgame tables: exact distance to mate for king and one piece against a bare king.
+
+    python egtb.py build egtb.bin                  # KQK, KRK and KPK on all cores
+    python egtb.py build egtb.bin --workers 2
+    python egtb.py probe egtb.bin --fen "8/8/8/4k3/8/8/8/KQ6 w - - 0 1"
+
+Tables are built by retrograde analysis: every position is classified
+once (illegal, checkmate, stalemate, or how many of its moves still have
+to be refuted), in parallel over the strong king squares, and the results
+then spread backwards from the mates by un-making moves, one ply at a
+time. Promotions lead from KPK into KQK, so KQK is built first; like the
+engine, pawns only ever promote to a queen.
+
+File layout, big-endian:
+    header  b"EGTB", version (u16), number of tables (u16)
+    index   per table: name (4 bytes, e.g. b"KQK\\0"), data offset (u32), length (u32)
+    data    one byte per position: 0 draw, 255 illegal, otherwise 1 + plies
+            to mate; an odd number of plies means the side to move mates
+
+Positions are indexed with White as the strong side and its king folded
+onto files a-d by mirroring; Black's pieces are flipped to White's when
+probing. Probing reads the memory-mapped file, so loading the tables
+costs nothing up front.
+
+    import egtb
+    egtb.use_tables("egtb.bin")   # engine.choose_move() now plays these endings from the tables
+"""
+import argparse
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import time
+
+import bitboard
+import engine
+
+MAGIC = b"EGTB"
+VERSION = 1
+HEADER = struct.Struct(">4sHH")
+INDEX_ENTRY = struct.Struct(">4sII")
+TABLES = {"KQK": "q", "KRK": "r", "KPK": "p"}  # Build order: KPK promotes into KQK
+KING_SLOTS = 32  # Strong king squares on files a-d
+SLOT_SIZE = 64 * 64 * 2
+SIZE = KING_SLOTS * SLOT_SIZE
+DRAW, ILLEGAL = 0, 255
+
+# ---------------- INDEXING ----------------
+def index(king, weak_king, piece, black_to_move):
+    """Table index of a position with White strong; mirrors it when the king is on files e-h"""
+    if king & 7 > 3:
+        king, weak_king, piece = king ^ 7, weak_king ^ 7, piece ^ 7
+    return ((((king >> 3) * 4 + (king & 7)) * 64 + weak_king) * 64 + piece) * 2 + black_to_move
+
+def unindex(i):
+    """(king, weak king, piece, black to move) squares of a table index"""
+    slot = i >> 13
+    return (slot >> 2) * 8 + (slot & 3), (i >> 7) & 63, (i >> 1) & 63, i & 1
+
+def attacks(kind, sq, occupied):
+    """Squares attacked by a white piece of the given kind"""
+    if kind == "q":
+        return bitboard.queen_attacks(sq, occupied)
+    if kind == "r":
+        return bitboard.rook_attacks(sq, occupied)
+    return bitboard.PAWN_ATTACKS[bitboard.WHITE][sq]
+
+# ---------------- GENERATION ----------------
+# Set in each pool process by init_generator()
+kind = None
+promotions = None  # KQK data when building KPK
+
+def init_generator(piece_kind, promotion_table):
+    global kind, promotions
+    kind, promotions = piece_kind, promotion_table
+
+def classify(i):
+    """(value, legal moves, 1 + plies of the fastest win by promotion) of one position.
+
+    value is ILLEGAL, 1 for checkmate or DRAW until the retrograde passes say
+    otherwise. Captures and promotions leave the table and are never
+    refuted here, so they keep their position from counting as lost.
+    """
+    king, weak, piece, black = unindex(i)
+    if len({king, weak, piece}) < 3 or bitboard.KING_ATTACKS[king] >> weak & 1:
+        return ILLEGAL, 0, 0
+    if kind == "p" and piece >> 3 in (0, 7):
+        return ILLEGAL, 0, 0
+    occupied = 1 << king | 1 << weak | 1 << piece
+    checked = attacks(kind, piece, occupied) >> weak & 1
+    if checked and not black:
+        return ILLEGAL, 0, 0  # White to move with the black king in check
+
+    moves = best_promotion = 0
+    if black:
+        guarded = bitboard.KING_ATTACKS[king] | attacks(kind, piece, occupied & ~(1 << weak))
+        moves = bin(bitboard.KING_ATTACKS[weak] & ~guarded).count("1")  # Includes taking the piece
+        if not moves:
+            return (1 if checked else DRAW), 0, 0
+        return DRAW, moves, 0
+
+    moves = bin(bitboard.KING_ATTACKS[king] & ~bitboard.KING_ATTACKS[weak] & ~occupied).count("1")
+    if kind != "p":
+        moves += bin(attacks(kind, piece, occupied) & ~occupied).count("1")
+    elif not occupied >> (piece - 8) & 1:
+        if piece >> 3 == 1:
+            # Promotion: a win in d plies of KQK with Black to move wins here in d + 1
+            value = promotions[index(king, weak, piece - 8, 1)]
+            if value not in (DRAW, ILLEGAL) and (value - 1) % 2 == 0:
+                best_promotion = value + 1
+        moves += 1
+        if piece >> 3 == 6 and not occupied >> (piece - 16) & 1:
+            moves += 1
+    if not moves:
+        return DRAW, 0, 0  # Stalemate
+    return DRAW, moves, best_promotion
+
+def classify_slot(slot):
+    """Classify the positions of one strong king square; runs in a pool process"""
+    values, counts, promoted = bytearray(SLOT_SIZE), bytearray(SLOT_SIZE), bytearray(SLOT_SIZE)
+    for j in range(SLOT_SIZE):
+        values[j], counts[j], promoted[j] = classify(slot * SLOT_SIZE + j)
+    return slot, bytes(values), bytes(counts), bytes(promoted)
+
+def unmoves(i):
+    """Indexes of the positions one move before position i, inside the same table"""
+    king, weak, piece, black = unindex(i)
+    occupied = 1 << king | 1 << weak | 1 << piece
+    if not black:
+        # Black just moved its king
+        return [index(king, sq, piece, 1)
+                for sq in bitboard.squares(bitboard.KING_ATTACKS[weak] & ~occupied)]
+    found = [index(sq, weak, piece, 0) for sq in bitboard.squares(bitboard.KING_ATTACKS[king] & ~occupied)]
+    if kind != "p":
+        found += [index(king, weak, sq, 0)
+                  for sq in bitboard.squares(attacks(kind, piece, occupied) & ~occupied)]
+    elif piece >> 3 <= 5 and not occupied >> (piece + 8) & 1:
+        found.append(index(king, weak, piece + 8, 0))
+        if piece >> 3 == 4 and not occupied >> (piece + 16) & 1:
+            found.append(index(king, weak, piece + 16, 0))
+    return found
+
+def generate(name, workers, promotion_table=None):
+    """Data of one table: classify in a process pool, then run the retrograde passes here"""
+    global kind, promotions
+    kind, promotions = TABLES[name], promotion_table
+    values, counts = bytearray(SIZE), bytearray(SIZE)
+    frontier = {}  # plies -> positions found to be decided in that many plies, or sooner
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(workers, init_generator, (kind, promotion_table)) as pool:
+        for slot, slot_values, slot_counts, promoted in pool.imap_unordered(classify_slot, range(KING_SLOTS)):
+            start = slot * SLOT_SIZE
+            values[start:start + SLOT_SIZE] = slot_values
+            counts[start:start + SLOT_SIZE] = slot_counts
+            for j, value in enumerate(promoted):
+                if value:
+                    frontier.setdefault(value - 1, []).append(start + j)
+
+    frontier.setdefault(0, []).extend(i for i in range(SIZE) if values[i] == 1)
+    values = values.translate(bytes([DRAW] * 255 + [ILLEGAL]))  # Mates are set again below
+    plies = 0
+    while frontier:
+        for i in frontier.pop(plies, ()):
+            if values[i] != DRAW:
+                continue  # Already reached in fewer plies
+            values[i] = plies + 1
+            for j in unmoves(i):
+                if values[j] != DRAW:
+                    continue
+                if plies % 2 == 0:
+                    frontier.setdefault(plies + 1, []).append(j)  # It can move into a lost position
+                else:
+                    counts[j] -= 1
+                    if not counts[j]:
+                        frontier.setdefault(plies + 1, []).append(j)  # Every move loses
+        plies += 1
+    return bytes(values)
+
+def build_tables(path, names=tuple(TABLES), workers=None):
+    """Generate the named tables and write them to path; returns {name: (wins, draws, losses)}"""
+    data, summary = {}, {}
+    for name in names:
+        data[name] = generate(name, workers or os.cpu_count(), data.get("KQK") if name == "KPK" else None)
+        counts = [0, 0, 0]
+        for value in data[name]:
+            if value != ILLEGAL:
+                counts[0 if value == DRAW else 2 - (value - 1) % 2] += 1
+        summary[name] = (counts[1], counts[0], counts[2])
+
+    offset = HEADER.size + INDEX_ENTRY.size * len(data)
+    with open(path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, VERSION, len(data)))
+        for name in data:
+            out.write(INDEX_ENTRY.pack(name.encode(), offset, SIZE))
+            offset += SIZE
+        for table in data.values():
+            out.write(table)
+    return summary
+
+# ---------------- PROBING ----------------
+class Tables:
+    """Read-only, memory-mapped view of a tables file"""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"{path} is empty") from None
+        try:
+            self.offsets = self.read_index(path)
+        except ValueError:
+            self.close()
+            raise
+
+    def read_index(self, path):
+        """Table name -> offset, after checking the header and that every table fits in the file"""
+        size = len(self.data)
+        if size < HEADER.size or HEADER.unpack_from(self.data)[:2] != (MAGIC, VERSION):
+            raise ValueError(f"{path} is not a version {VERSION} endgame table file")
+        count = HEADER.unpack_from(self.data)[2]
+        if size < HEADER.size + count * INDEX_ENTRY.size:
+            raise ValueError(f"{path} is truncated")
+        offsets = {}
+        for n in range(count):
+            name, offset, length = INDEX_ENTRY.unpack_from(self.data, HEADER.size + n * INDEX_ENTRY.size)
+            name = name.rstrip(b"\0").decode(errors="replace")
+            if length != SIZE or offset + length > size:
+                raise ValueError(f"{path} is truncated or table {name} is not {SIZE} bytes")
+            offsets[name] = offset
+        return offsets
+
+    def probe(self):
+        """Score of the current engine position for the side to move, or None when not covered.
+
+        A mate in d plies scores engine.MATE_SCORE - d like in the search;
+        bare kings and table draws score 0.
+        """
+        found = []
+        for r in range(8):
+            for c, piece in enumerate(engine.board[r]):
+                if piece and piece[1] != "k":
+                    found.append((piece, r * 8 + c))
+        if not found:
+            return 0
+        if len(found) > 1:
+            return None
+        (piece, sq), = found
+        offset = self.offsets.get(f"K{piece[1].upper()}K")
+        if offset is None:
+            return None
+        king, weak = (engine.king_squares[color] for color in (piece[0], "b" if piece[0] == "w" else "w"))
+        king, weak = king[0] * 8 + king[1], weak[0] * 8 + weak[1]
+        black = engine.turn == "black"
+        if piece[0] == "b":
+            # Flip the board so the strong side is White
+            king, weak, sq, black = king ^ 56, weak ^ 56, sq ^ 56, not black
+        value = self.data[offset + index(king, weak, sq, black)]
+        if value == ILLEGAL:
+            return None
+        if value == DRAW:
+            return 0
+        plies = value - 1
+        return engine.MATE_SCORE - plies if plies % 2 else -(engine.MATE_SCORE - plies)
+
+    def choose(self):
+        """Fastest mate, slowest loss or any holding move for the current position, or None"""
+        if self.probe() is None:
+            return None
+        best_move, best_score = None, None
+        for move in engine.position_info()["moves"]:
+            engine.make_move(move)
+            score = self.probe()
+            engine.unmake_move()
+            if score is None:
+                return None  # Leads into a table that is not loaded
+            if best_score is None or -score > best_score:
+                best_move, best_score = move, -score
+        return best_move
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+def use_tables(path):
+    """Install the tables at path for engine.choose_move(); None removes them"""
+    if engine.endgame_tables is not None:
+        engine.endgame_tables.close()
+    engine.endgame_tables = Tables(path) if path else None
+
+# ---------------- CLI ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Build or probe endgame tables")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="generate tables by retrograde analysis")
+    build.add_argument("tables")
+    build.add_argument("--only", nargs="+", choices=list(TABLES), help="tables to build (default all)")
+    build.add_argument("--workers", type=int, default=os.cpu_count(),
+                       help="processes to classify positions with (default: all cores)")
+    probe = commands.add_parser("probe", help="show the table result and moves of a position")
+    probe.add_argument("tables")
+    probe.add_argument("--fen", required=True)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        names = [name for name in TABLES if name in args.only] if args.only else list(TABLES)
+        if "KPK" in names and "KQK" not in names:
+            names.insert(0, "KQK")  # Needed for promotions
+        start = time.perf_counter()
+        summary = build_tables(args.tables, names, args.workers)
+        for name, (wins, draws, losses) in summary.items():
+            print(f"{name}: {wins:,} won, {draws:,} drawn, {losses:,} lost for the side to move")
+        print(f"Wrote {args.tables} in {time.perf_counter() - start:.1f}s")
+        return
+
+    engine.load_fen(args.fen)
+    tables = Tables(args.tables)
+    score = tables.probe()
+    if score is None:
+        print("Position not in the tables")
+        sys.exit(1)
+    for move in engine.position_info()["moves"]:
+        san = engine.move_san(move)
+        engine.make_move(move)
+        print(f"{san:8} {describe(-tables.probe())}")
+        engine.unmake_move()
+    print(f"Position: {describe(score)}")
+    tables.close()
+
+def describe(score):
+    if score == 0:
+        return "draw"
+    plies = engine.MATE_SCORE - abs(score)
+    return f"mate in {(plies + 1) // 2}" if score > 0 else f"mated in {plies // 2}"
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1462 @@
+"""Chess rules and AI, with no pygame dependency.
+
+The game state lives in module globals (board, turn, castling_rights,
+en_passant_target, ...). main.py draws it; perft.py and batch tools use it
+headless.
+"""
+import random
+import time
+from array import array
+
+# ---------------- BOARD (Starting position) ----------------
+# Rank 8 (index 0) to Rank 1 (index 7)
+# Files: a(0), b(1), c(2), d(3), e(4), f(5), g(6), h(7)
+board = [
+    ["br","bn","bb","bq","bk","bb","bn","br"],  # Rank 8
+    ["bp","bp","bp","bp","bp","bp","bp","bp"],  # Rank 7
+    ["","","","","","","",""],                   # Rank 6
+    ["","","","","","","",""],                   # Rank 5
+    ["","","","","","","",""],                   # Rank 4
+    ["","","","","","","",""],                   # Rank 3
+    ["wp","wp","wp","wp","wp","wp","wp","wp"],  # Rank 2
+    ["wr","wn","wb","wq","wk","wb","wn","wr"]   # Rank 1
+]
+
+turn = "white"
+game_state = "playing"  # "playing", "check" or one of GAME_OVER_STATES
+# Drawn endings: no legal move, threefold repetition, fifty-move rule, no mating material
+DRAW_STATES = ("stalemate", "repetition", "fifty_moves", "insufficient_material")
+GAME_OVER_STATES = ("checkmate",) + DRAW_STATES
+en_passant_target = None  # (row, col) of pawn that can be captured en passant
+
+# Castling rights as bits: white kingside/queenside, black kingside/queenside
+CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ = 1, 2, 4, 8
+CASTLE_KINGSIDE = {"w": CASTLE_WK, "b": CASTLE_BK}
+CASTLE_QUEENSIDE = {"w": CASTLE_WQ, "b": CASTLE_BQ}
+castling_rights = CASTLE_WK | CASTLE_WQ | CASTLE_BK | CASTLE_BQ
+
+undo_stack = []  # One undo record per move made, see make_move()
+# position_hash before every move made, preceded by the history given to
+# set_position(); only the last reversible_plies entries can still repeat
+hash_history = []
+reversible_plies = 0  # Half-moves since the last capture or pawn move
+start_ply = 0  # Half-moves played before it: 2 * (fullmove number - 1), +1 if Black to move
+
+# ---------------- MOVE LOGIC ----------------
+def path_clear(sr, sc, er, ec):
+    dr = er - sr
+    dc = ec - sc
+    if dr == 0 and dc == 0:
+        return False
+    step_r = (dr > 0) - (dr < 0) if dr != 0 else 0
+    step_c = (dc > 0) - (dc < 0) if dc != 0 else 0
+    r, c = sr + step_r, sc + step_c
+    while (r, c) != (er, ec):
+        if board[r][c] != "":
+            return False
+        r += step_r
+        c += step_c
+    return True
+
+def scan_kings():
+    """Locate both kings by scanning the board"""
+    kings = {"w": None, "b": None}
+    for r in range(8):
+        for c in range(8):
+            piece = board[r][c]
+            if piece and piece[1] == "k":
+                kings[piece[0]] = (r, c)
+    return kings
+
+king_squares = scan_kings()  # Kept up to date by make_move/unmake_move
+
+def find_king(color):
+    """Find the position of the king for the given color"""
+    return king_squares[color]
+
+def is_in_check(color):
+    """Check if the king of the given color is in check"""
+    king_pos = king_squares[color]
+    if not king_pos:
+        return False
+    return is_square_attacked(king_pos[0], king_pos[1], "b" if color == "w" else "w")
+
+def valid_move_without_check(sr, sc, er, ec):
+    """Check if move is valid without considering check (used internally)"""
+    piece = board[sr][sc]
+    if not piece:
+        return False
+
+    target = board[er][ec]
+    if target and target[0] == piece[0]:
+        return False
+
+    dr, dc = er - sr, ec - sc
+
+    # PAWN
+    if piece[1] == "p":
+        direction = -1 if piece[0] == "w" else 1
+        start_row = 6 if piece[0] == "w" else 1
+
+        # one step
+        if dc == 0 and dr == direction and target == "":
+            return True
+
+        # two steps on first move
+        if (sr == start_row and dc == 0 and
+            dr == 2 * direction and
+            board[sr + direction][sc] == "" and
+            target == ""):
+            return True
+
+        # capture
+        if abs(dc) == 1 and dr == direction and target != "":
+            return True
+        
+        # En passant
+        if en_passant_target and (er, ec) == en_passant_target:
+            if abs(dc) == 1 and dr == direction:
+                return True
+
+    # ROOK
+    if piece[1] == "r" and (sr == er or sc == ec):
+        return path_clear(sr, sc, er, ec)
+
+    # BISHOP
+    if piece[1] == "b" and abs(dr) == abs(dc):
+        return path_clear(sr, sc, er, ec)
+
+    # QUEEN
+    if piece[1] == "q":
+        if sr == er or sc == ec or abs(dr) == abs(dc):
+            return path_clear(sr, sc, er, ec)
+
+    # KNIGHT
+    if piece[1] == "n":
+        return (abs(dr), abs(dc)) in [(1,2),(2,1)]
+
+    # KING
+    if piece[1] == "k":
+        # Normal king move
+        if abs(dr) <= 1 and abs(dc) <= 1:
+            return True
+        # Castling
+        if abs(dc) == 2 and dr == 0 and sr in [0, 7]:
+            return can_castle(piece[0], sr, sc, er, ec)
+
+    return False
+
+def can_castle(color, kr, kc, er, ec):
+    """Check if castling is legal"""
+    # King must not have moved
+    if not castling_rights & (CASTLE_KINGSIDE[color] | CASTLE_QUEENSIDE[color]):
+        return False
+    
+    # King must not be in check
+    if is_in_check(color):
+        return False
+    
+    # Determine which side
+    if ec > kc:  # Kingside
+        if not castling_rights & CASTLE_KINGSIDE[color]:
+            return False
+        rook_col = 7
+        squares_between = [(kr, 5), (kr, 6)]
+    else:  # Queenside
+        if not castling_rights & CASTLE_QUEENSIDE[color]:
+            return False
+        rook_col = 0
+        squares_between = [(kr, 1), (kr, 2), (kr, 3)]
+    
+    # Check if rook exists and hasn't moved
+    if board[kr][rook_col] != (color + "r"):
+        return False
+    
+    # Check if squares between are empty
+    for r, c in squares_between:
+        if board[r][c] != "":
+            return False
+    
+    # Check if king passes through check
+    # King moves from kc to ec, so check squares between
+    step = 1 if ec > kc else -1
+    king_path = []
+    for col in range(kc + step, ec + step, step):
+        king_path.append((kr, col))
+    
+    opponent = "b" if color == "w" else "w"
+    for r, c in king_path:
+        if is_square_attacked(r, c, opponent):
+            return False
+    
+    return True
+
+def valid_move(sr, sc, er, ec):
+    """Check if move is valid, including check prevention"""
+    piece = board[sr][sc]
+    if not piece:
+        return False
+
+    # First check basic move validity
+    if not valid_move_without_check(sr, sc, er, ec):
+        return False
+
+    return king_safe_after(sr, sc, er, ec)
+
+def king_safe_after(sr, sc, er, ec):
+    """Check that a pseudo-legal move does not leave own king in check"""
+    color = board[sr][sc][0]
+    make_move((sr, sc, er, ec))
+    in_check = is_in_check(color)
+    unmake_move()
+    return not in_check
+
+# ---------------- MOVE GENERATION ----------------
+KNIGHT_OFFSETS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+KING_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+ROOK_DIRS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+BISHOP_DIRS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+SLIDER_DIRS = {"r": ROOK_DIRS, "b": BISHOP_DIRS, "q": ROOK_DIRS + BISHOP_DIRS}
+
+# ---------------- ATTACK DETECTION ----------------
+# Per square (r * 8 + c): knight and king target squares, and the rook and
+# bishop rays as lists of squares walking outward from it.
+def _jumps(r, c, offsets):
+    return [(r + dr, c + dc) for dr, dc in offsets if 0 <= r + dr < 8 and 0 <= c + dc < 8]
+
+def _rays(r, c, dirs):
+    rays = []
+    for dr, dc in dirs:
+        ray = []
+        er, ec = r + dr, c + dc
+        while 0 <= er < 8 and 0 <= ec < 8:
+            ray.append((er, ec))
+            er += dr
+            ec += dc
+        if ray:
+            rays.append(ray)
+    return rays
+
+KNIGHT_SQUARES = [_jumps(sq // 8, sq % 8, KNIGHT_OFFSETS) for sq in range(64)]
+KING_SQUARES = [_jumps(sq // 8, sq % 8, KING_OFFSETS) for sq in range(64)]
+ROOK_RAYS = [_rays(sq // 8, sq % 8, ROOK_DIRS) for sq in range(64)]
+BISHOP_RAYS = [_rays(sq // 8, sq % 8, BISHOP_DIRS) for sq in range(64)]
+
+def is_square_attacked(r, c, by, squares=board):
+    """Check if any piece of color by attacks (r, c), looking outward from the square.
+
+    squares defaults to the live board; parse_fen() passes a board of its own.
+    """
+    sq = r * 8 + c
+    # A white pawn attacks from the row below the square, a black pawn from above
+    pr = r + 1 if by == "w" else r - 1
+    if 0 <= pr < 8:
+        pawn = by + "p"
+        if (c > 0 and squares[pr][c - 1] == pawn) or (c < 7 and squares[pr][c + 1] == pawn):
+            return True
+    knight = by + "n"
+    for nr, nc in KNIGHT_SQUARES[sq]:
+        if squares[nr][nc] == knight:
+            return True
+    king = by + "k"
+    for kr, kc in KING_SQUARES[sq]:
+        if squares[kr][kc] == king:
+            return True
+    rook, bishop, queen = by + "r", by + "b", by + "q"
+    for ray in ROOK_RAYS[sq]:
+        for rr, rc in ray:
+            piece = squares[rr][rc]
+            if piece:
+                if piece == rook or piece == queen:
+                    return True
+                break
+    for ray in BISHOP_RAYS[sq]:
+        for br, bc in ray:
+            piece = squares[br][bc]
+            if piece:
+                if piece == bishop or piece == queen:
+                    return True
+                break
+    return False
+
+def pawn_moves(r, c, color):
+    """Yield pushes, captures and en passant for the pawn on (r, c)"""
+    direction = -1 if color == "w" else 1
+    start_row = 6 if color == "w" else 1
+    nr = r + direction
+    if not 0 <= nr < 8:
+        return
+    if board[nr][c] == "":
+        yield (r, c, nr, c)
+        if r == start_row and board[nr + direction][c] == "":
+            yield (r, c, nr + direction, c)
+    for nc in (c - 1, c + 1):
+        if 0 <= nc < 8:
+            target = board[nr][nc]
+            if target:
+                if target[0] != color:
+                    yield (r, c, nr, nc)
+            elif (en_passant_target == (nr, nc) and
+                  board[r][nc] and board[r][nc][0] != color and board[r][nc][1] == "p"):
+                yield (r, c, nr, nc)
+
+def piece_moves(r, c):
+    """Yield pseudo-legal moves for the piece on (r, c) following its movement pattern"""
+    piece = board[r][c]
+    color, kind = piece[0], piece[1]
+
+    if kind == "p":
+        yield from pawn_moves(r, c, color)
+    elif kind == "n" or kind == "k":
+        for dr, dc in (KNIGHT_OFFSETS if kind == "n" else KING_OFFSETS):
+            er, ec = r + dr, c + dc
+            if 0 <= er < 8 and 0 <= ec < 8:
+                target = board[er][ec]
+                if not target or target[0] != color:
+                    yield (r, c, er, ec)
+        # Castling: king on its home square with the right still available
+        if kind == "k" and c == 4 and r == (7 if color == "w" else 0):
+            if castling_rights & CASTLE_KINGSIDE[color] and can_castle(color, r, c, r, 6):
+                yield (r, c, r, 6)
+            if castling_rights & CASTLE_QUEENSIDE[color] and can_castle(color, r, c, r, 2):
+                yield (r, c, r, 2)
+    else:
+        for dr, dc in SLIDER_DIRS[kind]:
+            er, ec = r + dr, c + dc
+            while 0 <= er < 8 and 0 <= ec < 8:
+                target = board[er][ec]
+                if target:
+                    if target[0] != color:
+                        yield (r, c, er, ec)
+                    break
+                yield (r, c, er, ec)
+                er += dr
+                ec += dc
+
+def generate_moves(color):
+    """Lazily yield pseudo-legal moves (sr, sc, er, ec) for every piece of color"""
+    for r in range(8):
+        for c in range(8):
+            piece = board[r][c]
+            if piece and piece[0] == color:
+                yield from piece_moves(r, c)
+
+# ---------------- LEGAL MOVE GENERATION ----------------
+# Pins and checks are found once per position by walking outward from the
+# king. A pinned piece may only move along its pin line; in single check
+# every non-king move must capture the checker or block it; in double check
+# only the king moves. King steps are tested with the king lifted off the
+# board so a slider's line through it still counts. En passant can expose a
+# check along the rank through both pawns, so it alone is made and tested.
+def pins_and_checks(color):
+    """Return (pin lines by square, squares that resolve the check or None, checker count)"""
+    kr, kc = king_squares[color]
+    opponent = "b" if color == "w" else "w"
+    pins = {}
+    checkers = 0
+    check_mask = None
+
+    pr = kr - 1 if color == "w" else kr + 1
+    if 0 <= pr < 8:
+        pawn = opponent + "p"
+        for pc in (kc - 1, kc + 1):
+            if 0 <= pc < 8 and board[pr][pc] == pawn:
+                checkers += 1
+                check_mask = {(pr, pc)}
+    knight = opponent + "n"
+    for nr, nc in KNIGHT_SQUARES[kr * 8 + kc]:
+        if board[nr][nc] == knight:
+            checkers += 1
+            check_mask = {(nr, nc)}
+
+    queen = opponent + "q"
+    for rays, slider in ((ROOK_RAYS, opponent + "r"), (BISHOP_RAYS, opponent + "b")):
+        for ray in rays[kr * 8 + kc]:
+            blocker = None
+            for i, (r, c) in enumerate(ray):
+                piece = board[r][c]
+                if not piece:
+                    continue
+                if piece[0] == color:
+                    if blocker:
+                        break
+                    blocker = (r, c)
+                    continue
+                if piece == slider or piece == queen:
+                    line = set(ray[:i + 1])
+                    if blocker:
+                        pins[blocker] = line
+                    else:
+                        checkers += 1
+                        check_mask = line
+                break
+    return pins, check_mask, checkers
+
+def king_moves(kr, kc, color):
+    """Yield king steps to squares the opponent does not attack, plus castling"""
+    opponent = "b" if color == "w" else "w"
+    # Collect the safe squares before yielding so callers never see the board without the king
+    king = board[kr][kc]
+    board[kr][kc] = ""
+    steps = [(kr, kc, er, ec) for er, ec in KING_SQUARES[kr * 8 + kc]
+             if (not board[er][ec] or board[er][ec][0] != color) and
+             not is_square_attacked(er, ec, opponent)]
+    board[kr][kc] = king
+    yield from steps
+    if kc == 4 and kr == (7 if color == "w" else 0):
+        if castling_rights & CASTLE_KINGSIDE[color] and can_castle(color, kr, kc, kr, 6):
+            yield (kr, kc, kr, 6)
+        if castling_rights & CASTLE_QUEENSIDE[color] and can_castle(color, kr, kc, kr, 2):
+            yield (kr, kc, kr, 2)
+
+def legal_moves(color):
+    """Lazily yield moves for color that do not leave its own king in check"""
+    king_pos = king_squares[color]
+    if not king_pos:
+        # No king to protect (test positions): every pseudo-legal move is legal
+        yield from generate_moves(color)
+        return
+    kr, kc = king_pos
+    pins, check_mask, checkers = pins_and_checks(color)
+    if checkers < 2:
+        for r in range(8):
+            row = board[r]
+            for c in range(8):
+                piece = row[c]
+                if not piece or piece[0] != color or piece[1] == "k":
+                    continue
+                allowed = pins.get((r, c))
+                for m in (pawn_moves(r, c, color) if piece[1] == "p" else piece_moves(r, c)):
+                    er, ec = m[2], m[3]
+                    if piece[1] == "p" and ec != c and not board[er][ec]:
+                        if king_safe_after(*m):  # En passant
+                            yield m
+                    elif ((allowed is None or (er, ec) in allowed) and
+                          (check_mask is None or (er, ec) in check_mask)):
+                        yield m
+    yield from king_moves(kr, kc, color)
+
+def get_moves(color):
+    return list(legal_moves(color))
+
+# ---------------- ZOBRIST HASHING ----------------
+# Fixed seed so hashes are stable between runs (opening books, saved tables)
+_zobrist_random = random.Random(0x5EED)
+ZOBRIST_PIECES = {p: [_zobrist_random.getrandbits(64) for _ in range(64)]
+                  for p in ["wp","wr","wn","wb","wq","wk","bp","br","bn","bb","bq","bk"]}
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(16)]
+ZOBRIST_EP = [_zobrist_random.getrandbits(64) for _ in range(8)]  # By file
+
+def compute_hash():
+    """Full Zobrist hash of the current position"""
+    h = ZOBRIST_CASTLING[castling_rights]
+    for r in range(8):
+        for c in range(8):
+            if board[r][c]:
+                h ^= ZOBRIST_PIECES[board[r][c]][r * 8 + c]
+    if turn == "black":
+        h ^= ZOBRIST_BLACK_TO_MOVE
+    if en_passant_target:
+        h ^= ZOBRIST_EP[en_passant_target[1]]
+    return h
+
+position_hash = compute_hash()  # Kept up to date by make_move/unmake_move
+
+def halfmove_clock():
+    """Half-moves since the last capture or pawn move"""
+    return reversible_plies
+
+def fullmove_number():
+    return (start_ply + len(undo_stack)) // 2 + 1
+
+def repetition_history():
+    """Hashes of the earlier positions the current one can still repeat, oldest first"""
+    return hash_history[max(len(hash_history) - reversible_plies, 0):]
+
+def get_position():
+    """Copy of the current position in the form set_position() accepts"""
+    return ([row[:] for row in board], turn, castling_rights, en_passant_target,
+            halfmove_clock(), fullmove_number(), repetition_history())
+
+def set_position(new_board, new_turn="white", new_castling_rights=15, new_en_passant_target=None,
+                 new_halfmove_clock=0, new_fullmove_number=1, new_history=()):
+    """Load a position into the globals, clearing history and caches.
+
+    new_history holds the hashes of the positions before it, oldest first,
+    as repetition_history() returns them, so repetitions are still seen.
+    """
+    global turn, castling_rights, en_passant_target, position_hash
+    global eval_mg, eval_eg, eval_phase, reversible_plies, start_ply
+    board[:] = [row[:] for row in new_board]
+    turn = new_turn
+    castling_rights = new_castling_rights
+    en_passant_target = new_en_passant_target
+    reversible_plies = new_halfmove_clock
+    hash_history[:] = new_history
+    start_ply = 2 * (new_fullmove_number - 1) + (turn == "black")
+    king_squares.update(scan_kings())
+    position_hash = compute_hash()
+    eval_mg, eval_eg, eval_phase = evaluate_full()
+    undo_stack.clear()
+    invalidate_position_cache()
+
+# ---------------- POSITION CACHE ----------------
+# Legal moves, destination squares and game state for recently seen positions.
+# Entries are keyed by the full position, so lookups only happen after
+# make_move/unmake_move or invalidate_position_cache(); idle frames reuse
+# the current entry.
+POSITION_CACHE_SIZE = 64
+position_cache = {}
+current_position_info = None
+game_state_stale = True  # Set by every move, undo or load; update_game_state() clears it
+
+def position_key():
+    """Key identifying pieces, side to move, castling rights and en passant square"""
+    return position_hash
+
+def compute_position_info():
+    """Build the cache entry for the current position"""
+    color = "w" if turn == "white" else "b"
+    moves = get_moves(color)
+    destinations = {}
+    for sr, sc, er, ec in moves:
+        destinations.setdefault((sr, sc), set()).add((er, ec))
+
+    if is_in_check(color):
+        state = "check" if moves else "checkmate"
+    else:
+        state = "playing" if moves else "stalemate"
+    return {"moves": moves, "destinations": destinations, "state": state}
+
+def invalidate_position_cache():
+    """Call after every move, undo or position load"""
+    global current_position_info, game_state_stale
+    current_position_info = None
+    game_state_stale = True
+
+def position_info():
+    """Cached legal moves, per-square destinations and state for the side to move"""
+    global current_position_info
+    if current_position_info is None:
+        key = position_key()
+        info = position_cache.get(key)
+        if info is None:
+            info = compute_position_info()
+            if len(position_cache) >= POSITION_CACHE_SIZE:
+                del position_cache[next(iter(position_cache))]
+            position_cache[key] = info
+        current_position_info = info
+    return current_position_info
+
+def legal_destinations(r, c):
+    """Squares the piece on (r, c) can legally move to in the current position"""
+    return position_info()["destinations"].get((r, c), ())
+
+# ---------------- EVALUATION ----------------
+# Material and piece-square scores in centipawns, kept as running totals by
+# make_move/unmake_move. Tables are from White's side, rank 8 first; black
+# pieces use the mirrored square. Middlegame and endgame totals are blended
+# by the remaining material (phase).
+MG_VALUES = {"p": 100, "n": 320, "b": 330, "r": 500, "q": 900, "k": 0}
+EG_VALUES = {"p": 120, "n": 300, "b": 320, "r": 520, "q": 920, "k": 0}
+PHASE_WEIGHTS = {"p": 0, "n": 1, "b": 1, "r": 2, "q": 4, "k": 0}
+MAX_PHASE = 24
+
+PAWN_TABLE = [
+     0,  0,  0,  0,  0,  0,  0,  0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+     5,  5, 10, 25, 25, 10,  5,  5,
+     0,  0,  0, 20, 20,  0,  0,  0,
+     5, -5,-10,  0,  0,-10, -5,  5,
+     5, 10, 10,-20,-20, 10, 10,  5,
+     0,  0,  0,  0,  0,  0,  0,  0]
+PAWN_ENDGAME_TABLE = [
+     0,  0,  0,  0,  0,  0,  0,  0,
+    80, 80, 80, 80, 80, 80, 80, 80,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    30, 30, 30, 30, 30, 30, 30, 30,
+    15, 15, 15, 15, 15, 15, 15, 15,
+     5,  5,  5,  5,  5,  5,  5,  5,
+     0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0]
+KNIGHT_TABLE = [
+   -50,-40,-30,-30,-30,-30,-40,-50,
+   -40,-20,  0,  0,  0,  0,-20,-40,
+   -30,  0, 10, 15, 15, 10,  0,-30,
+   -30,  5, 15, 20, 20, 15,  5,-30,
+   -30,  0, 15, 20, 20, 15,  0,-30,
+   -30,  5, 10, 15, 15, 10,  5,-30,
+   -40,-20,  0,  5,  5,  0,-20,-40,
+   -50,-40,-30,-30,-30,-30,-40,-50]
+BISHOP_TABLE = [
+   -20,-10,-10,-10,-10,-10,-10,-20,
+   -10,  0,  0,  0,  0,  0,  0,-10,
+   -10,  0,  5, 10, 10,  5,  0,-10,
+   -10,  5,  5, 10, 10,  5,  5,-10,
+   -10,  0, 10, 10, 10, 10,  0,-10,
+   -10, 10, 10, 10, 10, 10, 10,-10,
+   -10,  5,  0,  0,  0,  0,  5,-10,
+   -20,-10,-10,-10,-10,-10,-10,-20]
+ROOK_TABLE = [
+     0,  0,  0,  0,  0,  0,  0,  0,
+     5, 10, 10, 10, 10, 10, 10,  5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+     0,  0,  0,  5,  5,  0,  0,  0]
+QUEEN_TABLE = [
+   -20,-10,-10, -5, -5,-10,-10,-20,
+   -10,  0,  0,  0,  0,  0,  0,-10,
+   -10,  0,  5,  5,  5,  5,  0,-10,
+    -5,  0,  5,  5,  5,  5,  0, -5,
+     0,  0,  5,  5,  5,  5,  0, -5,
+   -10,  5,  5,  5,  5,  5,  0,-10,
+   -10,  0,  5,  0,  0,  0,  0,-10,
+   -20,-10,-10, -5, -5,-10,-10,-20]
+KING_TABLE = [
+   -30,-40,-40,-50,-50,-40,-40,-30,
+   -30,-40,-40,-50,-50,-40,-40,-30,
+   -30,-40,-40,-50,-50,-40,-40,-30,
+   -30,-40,-40,-50,-50,-40,-40,-30,
+   -20,-30,-30,-40,-40,-30,-30,-20,
+   -10,-20,-20,-20,-20,-20,-20,-10,
+    20, 20,  0,  0,  0,  0, 20, 20,
+    20, 30, 10,  0,  0, 10, 30, 20]
+KING_ENDGAME_TABLE = [
+   -50,-40,-30,-20,-20,-30,-40,-50,
+   -30,-20,-10,  0,  0,-10,-20,-30,
+   -30,-10, 20, 30, 30, 20,-10,-30,
+   -30,-10, 30, 40, 40, 30,-10,-30,
+   -30,-10, 30, 40, 40, 30,-10,-30,
+   -30,-10, 20, 30, 30, 20,-10,-30,
+   -30,-30,  0,  0,  0,  0,-30,-30,
+   -50,-30,-30,-30,-30,-30,-30,-50]
+MG_TABLES = {"p": PAWN_TABLE, "n": KNIGHT_TABLE, "b": BISHOP_TABLE,
+             "r": ROOK_TABLE, "q": QUEEN_TABLE, "k": KING_TABLE}
+EG_TABLES = {"p": PAWN_ENDGAME_TABLE, "n": KNIGHT_TABLE, "b": BISHOP_TABLE,
+             "r": ROOK_TABLE, "q": QUEEN_TABLE, "k": KING_ENDGAME_TABLE}
+
+def _square_scores(values, tables):
+    """Per-piece list of 64 signed scores: positive for Black, like evaluate()"""
+    scores = {}
+    for kind, table in tables.items():
+        scores["w" + kind] = [-(values[kind] + table[sq]) for sq in range(64)]
+        scores["b" + kind] = [values[kind] + table[(7 - sq // 8) * 8 + sq % 8] for sq in range(64)]
+    return scores
+
+PST_MG = _square_scores(MG_VALUES, MG_TABLES)
+PST_EG = _square_scores(EG_VALUES, EG_TABLES)
+PHASE = {p: PHASE_WEIGHTS[p[1]] for p in PST_MG}
+
+EVAL_DEBUG = False  # Cross-check the running totals against a full recompute
+
+def evaluate_full():
+    """Recompute (middlegame, endgame, phase) totals by scanning the board"""
+    mg = eg = phase = 0
+    for r in range(8):
+        for c in range(8):
+            piece = board[r][c]
+            if piece:
+                mg += PST_MG[piece][r * 8 + c]
+                eg += PST_EG[piece][r * 8 + c]
+                phase += PHASE[piece]
+    return mg, eg, phase
+
+eval_mg, eval_eg, eval_phase = evaluate_full()
+
+def taper(mg, eg, phase):
+    phase = min(phase, MAX_PHASE)
+    return (mg * phase + eg * (MAX_PHASE - phase)) // MAX_PHASE
+
+# ---------------- MAKE / UNMAKE ----------------
+# Castling rights kept when a move starts or ends on a king or rook home square
+CASTLING_KEEP = {
+    (7, 4): ~(CASTLE_WK | CASTLE_WQ), (7, 7): ~CASTLE_WK, (7, 0): ~CASTLE_WQ,
+    (0, 4): ~(CASTLE_BK | CASTLE_BQ), (0, 7): ~CASTLE_BK, (0, 0): ~CASTLE_BQ,
+}
+
+def make_move(move):
+    """Play move (sr, sc, er, ec) on the board and push an undo record.
+
+    Handles captures, en passant, castling, promotion (always to a queen),
+    castling rights, the en passant square, the side to move, the
+    incremental Zobrist hash, the running evaluation totals and the
+    repetition history.
+    """
+    global turn, en_passant_target, castling_rights, position_hash, current_position_info, game_state_stale
+    global eval_mg, eval_eg, eval_phase, reversible_plies
+    sr, sc, er, ec = move
+    piece = board[sr][sc]
+    captured = board[er][ec]
+    undo_stack.append((move, piece, captured, castling_rights, en_passant_target,
+                       eval_mg, eval_eg, eval_phase, reversible_plies))
+    hash_history.append(position_hash)
+    reversible_plies = 0 if captured or piece[1] == "p" else reversible_plies + 1
+    fsq, tsq = sr * 8 + sc, er * 8 + ec
+
+    h = position_hash ^ ZOBRIST_BLACK_TO_MOVE ^ ZOBRIST_CASTLING[castling_rights]
+    if en_passant_target:
+        h ^= ZOBRIST_EP[en_passant_target[1]]
+    h ^= ZOBRIST_PIECES[piece][fsq]
+    mg = eval_mg - PST_MG[piece][fsq]
+    eg = eval_eg - PST_EG[piece][fsq]
+    if captured:
+        h ^= ZOBRIST_PIECES[captured][tsq]
+        mg -= PST_MG[captured][tsq]
+        eg -= PST_EG[captured][tsq]
+        eval_phase -= PHASE[captured]
+
+    if piece[1] == "p":
+        if sc != ec and not captured:
+            # En passant
+            victim, vsq = board[sr][ec], sr * 8 + ec
+            h ^= ZOBRIST_PIECES[victim][vsq]
+            mg -= PST_MG[victim][vsq]
+            eg -= PST_EG[victim][vsq]
+            board[sr][ec] = ""
+        if er == 0 or er == 7:
+            piece = piece[0] + "q"
+            eval_phase += PHASE[piece]
+    elif piece[1] == "k":
+        king_squares[piece[0]] = (er, ec)
+        if ec - sc in (2, -2):
+            rook_start_col, rook_end_col = (7, 5) if ec > sc else (0, 3)
+            rook = board[sr][rook_start_col]
+            rsq, rtsq = sr * 8 + rook_start_col, sr * 8 + rook_end_col
+            h ^= ZOBRIST_PIECES[rook][rsq] ^ ZOBRIST_PIECES[rook][rtsq]
+            mg += PST_MG[rook][rtsq] - PST_MG[rook][rsq]
+            eg += PST_EG[rook][rtsq] - PST_EG[rook][rsq]
+            board[sr][rook_end_col] = rook
+            board[sr][rook_start_col] = ""
+
+    board[er][ec] = piece
+    board[sr][sc] = ""
+    h ^= ZOBRIST_PIECES[piece][tsq]
+    eval_mg = mg + PST_MG[piece][tsq]
+    eval_eg = eg + PST_EG[piece][tsq]
+
+    if castling_rights:
+        castling_rights &= CASTLING_KEEP.get((sr, sc), -1) & CASTLING_KEEP.get((er, ec), -1)
+    if piece[1] == "p" and er - sr in (2, -2):
+        en_passant_target = ((sr + er) // 2, sc)
+        h ^= ZOBRIST_EP[sc]
+    else:
+        en_passant_target = None
+    position_hash = h ^ ZOBRIST_CASTLING[castling_rights]
+    turn = "black" if turn == "white" else "white"
+    current_position_info = None
+    game_state_stale = True
+
+def unmake_move():
+    """Take back the last move made with make_move and return it"""
+    global turn, en_passant_target, castling_rights, position_hash, current_position_info, game_state_stale
+    global eval_mg, eval_eg, eval_phase, reversible_plies
+    (move, piece, captured, castling_rights, en_passant_target,
+     eval_mg, eval_eg, eval_phase, reversible_plies) = undo_stack.pop()
+    position_hash = hash_history.pop()
+    sr, sc, er, ec = move
+
+    board[sr][sc] = piece
+    board[er][ec] = captured
+    if piece[1] == "p":
+        if sc != ec and not captured:
+            board[sr][ec] = ("b" if piece[0] == "w" else "w") + "p"
+    elif piece[1] == "k":
+        king_squares[piece[0]] = (sr, sc)
+        if ec - sc in (2, -2):
+            rook_start_col, rook_end_col = (7, 5) if ec > sc else (0, 3)
+            board[sr][rook_start_col] = board[sr][rook_end_col]
+            board[sr][rook_end_col] = ""
+
+    turn = "black" if turn == "white" else "white"
+    current_position_info = None
+    game_state_stale = True
+    return move
+
+# ---------------- DRAWS ----------------
+def repetitions():
+    """Earlier occurrences of the current position since the last irreversible move"""
+    count = 0
+    stop = max(len(hash_history) - reversible_plies, 0)
+    # The same side is to move every second ply, and a position cannot recur within two
+    for i in range(len(hash_history) - 4, stop - 1, -2):
+        if hash_history[i] == position_hash:
+            count += 1
+    return count
+
+def insufficient_material():
+    """True when neither side can mate: bare kings, one minor piece or bishops on one square colour"""
+    if eval_phase > 2:
+        return False  # A rook, a queen or three minor pieces
+    square_colors = set()
+    minors = 0
+    for r in range(8):
+        for c, piece in enumerate(board[r]):
+            if piece and piece[1] != "k":
+                if piece[1] in "prq":
+                    return False
+                minors += 1
+                square_colors.add((r + c) % 2 if piece[1] == "b" else None)
+    return minors <= 1 or (None not in square_colors and len(square_colors) == 1)
+
+def draw_state():
+    """The DRAW_STATES reason the position is drawn by rule, ignoring stalemate, or None"""
+    if reversible_plies >= 100:
+        return "fifty_moves"
+    if reversible_plies >= 8 and repetitions() >= 2:
+        return "repetition"
+    if insufficient_material():
+        return "insufficient_material"
+    return None
+
+# ---------------- FEN ----------------
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+FEN_CASTLING = {"K": CASTLE_WK, "Q": CASTLE_WQ, "k": CASTLE_BK, "q": CASTLE_BQ}
+
+def square_name(r, c):
+    return "abcdefgh"[c] + str(8 - r)
+
+def move_name(move):
+    """Coordinate notation such as "e2e4" for a (sr, sc, er, ec) move"""
+    sr, sc, er, ec = move
+    return square_name(sr, sc) + square_name(er, ec)
+
+def parse_move(name):
+    """Inverse of move_name: (sr, sc, er, ec) for a string such as "e2e4"; raises ValueError"""
+    if (len(name) < 4 or name[0] not in "abcdefgh" or name[2] not in "abcdefgh" or
+            name[1] not in "12345678" or name[3] not in "12345678"):
+        raise ValueError(f"Bad move {name!r}")
+    return (8 - int(name[1]), ord(name[0]) - ord("a"), 8 - int(name[3]), ord(name[2]) - ord("a"))
+
+def move_san(move):
+    """Standard algebraic notation such as "Nbd7", "exd5" or "O-O+" for a legal move"""
+    sr, sc, er, ec = move
+    piece = board[sr][sc]
+    kind = piece[1]
+    capture = board[er][ec] != "" or (kind == "p" and sc != ec)
+    if kind == "k" and ec - sc in (2, -2):
+        san = "O-O" if ec > sc else "O-O-O"
+    elif kind == "p":
+        san = ("abcdefgh"[sc] + "x" if capture else "") + square_name(er, ec)
+        if er == 0 or er == 7:
+            san += "=Q"
+    else:
+        # Name the file, rank or both when another piece of the same kind can reach the square
+        rivals = [(r, c) for r, c, tr, tc in position_info()["moves"]
+                  if (tr, tc) == (er, ec) and (r, c) != (sr, sc) and board[r][c] == piece]
+        origin = ""
+        if rivals:
+            if all(c != sc for r, c in rivals):
+                origin = "abcdefgh"[sc]
+            elif all(r != sr for r, c in rivals):
+                origin = str(8 - sr)
+            else:
+                origin = square_name(sr, sc)
+        san = kind.upper() + origin + ("x" if capture else "") + square_name(er, ec)
+
+    make_move(move)
+    state = position_info()["state"]
+    unmake_move()
+    if state == "checkmate":
+        san += "#"
+    elif state == "check":
+        san += "+"
+    return san
+
+def parse_san(san):
+    """Inverse of move_san for the current position; check marks and annotations are optional"""
+    wanted = san.rstrip("+#!?")
+    for move in position_info()["moves"]:
+        if move_san(move).rstrip("+#") == wanted:
+            return move
+    raise ValueError(f"Illegal or ambiguous move {san!r}")
+
+def parse_placement(placement):
+    """8 x 8 board for the first FEN field; raises ValueError"""
+    rows = placement.split("/")
+    if len(rows) != 8:
+        raise ValueError(f"FEN needs 8 ranks: {placement!r}")
+    new_board = []
+    for row in rows:
+        squares = []
+        for ch in row:
+            if ch in "12345678":
+                squares.extend([""] * int(ch))
+            elif ch.lower() in "pnbrqk":
+                squares.append(("w" if ch.isupper() else "b") + ch.lower())
+            else:
+                raise ValueError(f"Bad piece {ch!r} in FEN: {placement!r}")
+        if len(squares) != 8:
+            raise ValueError(f"FEN rank {row!r} is not 8 squares")
+        new_board.append(squares)
+    return new_board
+
+def parse_fen(fen):
+    """Split a FEN string into the arguments of set_position().
+
+    The halfmove clock and fullmove number may be left out, as in EPD.
+    Raises ValueError for malformed fields and for positions the engine
+    cannot play: not exactly one king each, the side not to move in check,
+    a pawn on the back rank or an en passant square without its pawn.
+    """
+    fields = fen.split()
+    if len(fields) < 4 or len(fields) > 6:
+        raise ValueError(f"FEN needs 4 to 6 fields: {fen!r}")
+    new_board = parse_placement(fields[0])
+
+    if fields[1] not in ("w", "b"):
+        raise ValueError(f"FEN side to move must be w or b: {fen!r}")
+    new_turn = "white" if fields[1] == "w" else "black"
+    rights = 0
+    if fields[2] != "-":
+        for ch in fields[2]:
+            if ch not in FEN_CASTLING:
+                raise ValueError(f"Bad castling rights {fields[2]!r} in FEN: {fen!r}")
+            rights |= FEN_CASTLING[ch]
+    ep = None
+    if fields[3] != "-":
+        # The target square is behind a pawn that has just made a double step
+        ep_rank, pawn = ("6", "bp") if new_turn == "white" else ("3", "wp")
+        if len(fields[3]) != 2 or fields[3][0] not in "abcdefgh" or fields[3][1] != ep_rank:
+            raise ValueError(f"Bad en passant square {fields[3]!r} in FEN: {fen!r}")
+        ep = (8 - int(fields[3][1]), ord(fields[3][0]) - ord("a"))
+        if new_board[ep[0] + (1 if new_turn == "white" else -1)][ep[1]] != pawn:
+            raise ValueError(f"No pawn to capture en passant on {fields[3]!r} in FEN: {fen!r}")
+    try:
+        counters = [int(field) for field in fields[4:]]
+    except ValueError:
+        raise ValueError(f"FEN move counters must be numbers: {fen!r}") from None
+    if (counters[:1] and counters[0] < 0) or (counters[1:] and counters[1] < 1):
+        raise ValueError(f"FEN move counters out of range: {fen!r}")
+
+    kings = {}
+    for r, row in enumerate(new_board):
+        for c, piece in enumerate(row):
+            if piece[1:] == "k":
+                kings.setdefault(piece[0], []).append((r, c))
+            elif piece[1:] == "p" and r in (0, 7):
+                raise ValueError(f"Pawn on the first or last rank in FEN: {fen!r}")
+    if len(kings.get("w", ())) != 1 or len(kings.get("b", ())) != 1:
+        raise ValueError(f"FEN needs exactly one king per side: {fen!r}")
+    waiting = "b" if new_turn == "white" else "w"
+    if is_square_attacked(*kings[waiting][0], "w" if waiting == "b" else "b", new_board):
+        raise ValueError(f"Side not to move is in check in FEN: {fen!r}")
+    return (new_board, new_turn, rights, ep) + tuple(counters)
+
+def load_fen(fen):
+    """Replace the current position with the one described by fen"""
+    set_position(*parse_fen(fen))
+
+def placement_fen(squares):
+    """First FEN field for an 8 x 8 board"""
+    rows = []
+    for row in squares:
+        text, empty = "", 0
+        for piece in row:
+            if not piece:
+                empty += 1
+                continue
+            if empty:
+                text += str(empty)
+                empty = 0
+            text += piece[1].upper() if piece[0] == "w" else piece[1]
+        rows.append(text + (str(empty) if empty else ""))
+    return "/".join(rows)
+
+def to_fen():
+    """FEN string for the current position, including the move counters"""
+    rights = "".join(ch for ch, bit in FEN_CASTLING.items() if castling_rights & bit) or "-"
+    ep = square_name(*en_passant_target) if en_passant_target else "-"
+    return (f"{placement_fen(board)} {'w' if turn == 'white' else 'b'} {rights} {ep} "
+            f"{halfmove_clock()} {fullmove_number()}")
+
+def parse_epd(line):
+    """Split an EPD record into (FEN fields, {opcode: operand string}).
+
+    A plain FEN line is accepted too and yields no operations. Operands keep
+    their original text, e.g. {"bm": "Nf3 Qd2", "id": '"puzzle 12"'}.
+    """
+    fields = line.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError(f"EPD needs at least 4 fields: {line!r}")
+    fen, rest = " ".join(fields[:4]), fields[4] if len(fields) > 4 else ""
+    counters = rest.split()
+    if len(counters) == 2 and all(field.isdigit() for field in counters):
+        return f"{fen} {rest}", {}
+    operations = {}
+    for operation in rest.split(";"):
+        operation = operation.strip()
+        if operation:
+            opcode, _, operand = operation.partition(" ")
+            operations[opcode] = operand.strip()
+    return fen, operations
+
+# ---------------- TRANSPOSITION TABLE ----------------
+# Two flat arrays of 64-bit words: the full position hash and a packed entry
+#   bits 0-11 best move (from square << 6 | to square, 0 = none)
+#   bits 12-19 depth, 20-21 bound, 22-29 search generation, 32-63 score + 2**31
+# Slots come in pairs; a new entry replaces the stale or shallower of the two.
+TT_SIZE_MB = 16
+TT_EXACT, TT_LOWER, TT_UPPER = 1, 2, 3
+
+tt_keys = array("Q")  # Allocated on the first search
+tt_data = array("Q")
+tt_mask = 0
+tt_size_mb = TT_SIZE_MB
+tt_generation = 0
+
+def tt_resize(size_mb=TT_SIZE_MB):
+    """Allocate an empty table of at most size_mb megabytes"""
+    global tt_keys, tt_data, tt_mask, tt_size_mb
+    tt_size_mb = size_mb
+    entries = 2
+    while entries * 2 * 16 <= size_mb * 1024 * 1024:
+        entries *= 2
+    tt_keys = array("Q", bytes(8 * entries))
+    tt_data = array("Q", bytes(8 * entries))
+    tt_mask = entries - 2
+
+def tt_clear():
+    tt_resize(tt_size_mb)
+
+def tt_new_search():
+    """Start a new generation so entries from older searches get replaced first"""
+    global tt_generation
+    tt_generation = (tt_generation + 1) & 0xFF
+
+def tt_probe(key):
+    """Return (depth, bound, score, move) stored for key, or None"""
+    i = key & tt_mask
+    if tt_keys[i] != key:
+        i += 1
+        if tt_keys[i] != key:
+            return None
+    data = tt_data[i]
+    packed_move = data & 0xFFF
+    move = None
+    if packed_move:
+        frm, to = packed_move >> 6, packed_move & 63
+        move = (frm >> 3, frm & 7, to >> 3, to & 7)
+    return ((data >> 12) & 0xFF, (data >> 20) & 3, (data >> 32) - (1 << 31), move)
+
+def tt_store(key, depth, bound, score, move):
+    i = key & tt_mask
+    if tt_keys[i] != key and tt_keys[i + 1] != key:
+        # Depth-preferred, but entries from earlier searches age out first
+        first, second = tt_data[i], tt_data[i + 1]
+        first_old = (first >> 22) & 0xFF != tt_generation
+        second_old = (second >> 22) & 0xFF != tt_generation
+        if first_old != second_old:
+            if second_old:
+                i += 1
+        elif (second >> 12) & 0xFF < (first >> 12) & 0xFF:
+            i += 1
+    elif tt_keys[i] != key:
+        i += 1
+    packed_move = 0
+    if move:
+        packed_move = (move[0] * 8 + move[1]) << 6 | (move[2] * 8 + move[3])
+    tt_keys[i] = key
+    tt_data[i] = (packed_move | min(depth, 255) << 12 | bound << 20 | tt_generation << 22 |
+                  (score + (1 << 31)) << 32)
+
+# ---------------- AI (EASY MODE) ----------------
+def evaluate():
+    """Score in centipawns, positive when Black is better"""
+    if EVAL_DEBUG:
+        assert (eval_mg, eval_eg, eval_phase) == evaluate_full(), "incremental evaluation out of sync"
+    return taper(eval_mg, eval_eg, eval_phase)
+
+def update_game_state():
+    """Update game state (check, checkmate, stalemate or a draw by rule).
+
+    Does nothing until the position changes, so calling it every frame is free.
+    """
+    global game_state, game_state_stale
+    if not game_state_stale:
+        return
+    game_state_stale = False
+    game_state = position_info()["state"]
+    if game_state in ("playing", "check"):
+        # Mate on the move that completes the fifty-move rule still counts
+        game_state = draw_state() or game_state
+
+def relative_evaluate():
+    """evaluate() from the point of view of the side to move"""
+    return evaluate() if turn == "black" else -evaluate()
+
+def easy_move():
+    """One-ply greedy choice: the move with the best immediate evaluation"""
+    best_score = -MATE_SCORE
+    best_move = None
+
+    for m in get_moves("w" if turn == "white" else "b"):
+        make_move(m)
+        score = -relative_evaluate()   # EASY AI
+        unmake_move()
+
+        if score > best_score:
+            best_score = score
+            best_move = m
+    return best_move
+
+# ---------------- AI (SEARCH) ----------------
+AI_MODE = "search"      # "easy" plays the one-ply greedy move instead
+AI_TIME_LIMIT = 1.0     # Seconds per move
+AI_NODE_LIMIT = None    # Optional node budget per move
+AI_MAX_DEPTH = 64
+MATE_SCORE = 100000
+
+search_nodes = 0
+search_deadline = None
+search_node_limit = None
+search_stop = None  # Optional event-like object; search aborts once it is set
+last_search = {}  # depth, score, nodes, time and nodes per iteration of the last search
+opening_book = None  # Consulted by choose_move() before searching, see book.use_book()
+endgame_tables = None  # Consulted first when few pieces are left, see egtb.use_tables()
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time or node budget runs out"""
+
+def score_to_tt(score, ply):
+    """Store mate scores relative to the node, not the root"""
+    if score > MATE_SCORE - 1000:
+        return score + ply
+    if score < -MATE_SCORE + 1000:
+        return score - ply
+    return score
+
+def score_from_tt(score, ply):
+    if score > MATE_SCORE - 1000:
+        return score - ply
+    if score < -MATE_SCORE + 1000:
+        return score + ply
+    return score
+
+# ---------------- MOVE ORDERING ----------------
+# Hash move, then captures that do not lose material (most valuable victim,
+# least valuable attacker first), then the two killer moves of the ply,
+# then quiet moves by history score, and losing captures last.
+SEE_VALUES = {"p": 100, "n": 320, "b": 330, "r": 500, "q": 900, "k": 20000}
+MAX_PLY = 128
+ORDER_HASH, ORDER_GOOD_CAPTURE, ORDER_KILLER, ORDER_BAD_CAPTURE = 4 << 20, 3 << 20, 2 << 20, -(1 << 20)
+HISTORY_LIMIT = 1 << 20  # Keep history scores below the killer band
+
+killers = [[None, None] for _ in range(MAX_PLY)]
+history = {}  # piece -> [score per destination square]
+
+def clear_move_ordering():
+    """Forget killers and age history scores at the start of a search"""
+    for slot in killers:
+        slot[0] = slot[1] = None
+    for scores in history.values():
+        for sq in range(64):
+            scores[sq] >>= 2
+
+def captured_piece(move):
+    """The piece a move takes, counting en passant, or "" """
+    sr, sc, er, ec = move
+    target = board[er][ec]
+    if not target and sc != ec and board[sr][sc][1] == "p":
+        return board[sr][ec]
+    return target
+
+def least_valuable_attacker(r, c, by):
+    """(row, col) of the cheapest piece of color by attacking (r, c), or None"""
+    pr = r + 1 if by == "w" else r - 1
+    if 0 <= pr < 8:
+        pawn = by + "p"
+        if c > 0 and board[pr][c - 1] == pawn:
+            return (pr, c - 1)
+        if c < 7 and board[pr][c + 1] == pawn:
+            return (pr, c + 1)
+    sq = r * 8 + c
+    knight = by + "n"
+    for nr, nc in KNIGHT_SQUARES[sq]:
+        if board[nr][nc] == knight:
+            return (nr, nc)
+    best, best_value = None, SEE_VALUES["k"] + 1
+    for rays, kinds in ((BISHOP_RAYS, "bq"), (ROOK_RAYS, "rq")):
+        for ray in rays[sq]:
+            for rr, rc in ray:
+                piece = board[rr][rc]
+                if piece:
+                    if piece[0] == by and piece[1] in kinds and SEE_VALUES[piece[1]] < best_value:
+                        best, best_value = (rr, rc), SEE_VALUES[piece[1]]
+                    break
+    if best:
+        return best
+    king = by + "k"
+    for kr, kc in KING_SQUARES[sq]:
+        if board[kr][kc] == king:
+            return (kr, kc)
+    return None
+
+def see(move):
+    """Static exchange evaluation: material the side to move expects to win with a capture.
+
+    Both sides recapture on the destination with their cheapest attacker and
+    may stop whenever continuing would lose material. Sliders behind a
+    capturing piece join in as it leaves; pins are ignored.
+    """
+    sr, sc, er, ec = move
+    mover = board[sr][sc]
+    gains = [SEE_VALUES[captured_piece(move)[1]] if captured_piece(move) else 0]
+    changed = [(sr, sc, mover), (er, ec, board[er][ec])]
+    board[sr][sc] = ""
+    on_square = SEE_VALUES[mover[1]]
+    side = "b" if mover[0] == "w" else "w"
+    while True:
+        attacker = least_valuable_attacker(er, ec, side)
+        if attacker is None:
+            break
+        ar, ac = attacker
+        piece = board[ar][ac]
+        if piece[1] == "k" and is_square_attacked(er, ec, "b" if side == "w" else "w"):
+            break  # The king cannot recapture into a defended square
+        gains.append(on_square - gains[-1])
+        on_square = SEE_VALUES[piece[1]]
+        changed.append((ar, ac, piece))
+        board[ar][ac] = ""
+        side = "b" if side == "w" else "w"
+    for r, c, piece in reversed(changed):
+        board[r][c] = piece
+    for i in range(len(gains) - 1, 0, -1):
+        gains[i - 1] = -max(-gains[i - 1], gains[i])
+    return gains[0]
+
+def order_moves(moves, tt_move, ply):
+    """Sort moves in place, most promising first"""
+    slot = killers[ply]
+    scores = {}
+    for m in moves:
+        if m == tt_move:
+            scores[m] = ORDER_HASH
+            continue
+        piece = board[m[0]][m[1]]
+        victim = captured_piece(m)
+        if victim:
+            mvv_lva = 10 * SEE_VALUES[victim[1]] - SEE_VALUES[piece[1]] // 10
+            if SEE_VALUES[victim[1]] >= SEE_VALUES[piece[1]] or see(m) >= 0:
+                scores[m] = ORDER_GOOD_CAPTURE + mvv_lva
+            else:
+                scores[m] = ORDER_BAD_CAPTURE + mvv_lva
+        elif m == slot[0] or m == slot[1]:
+            scores[m] = ORDER_KILLER + (m == slot[0])
+        else:
+            scores[m] = history[piece][m[2] * 8 + m[3]] if piece in history else 0
+    moves.sort(key=scores.__getitem__, reverse=True)
+
+def record_cutoff(move, depth, ply):
+    """Remember a quiet move that caused a beta cutoff as a killer and in the history table"""
+    slot = killers[ply]
+    if slot[0] != move:
+        slot[1], slot[0] = slot[0], move
+    piece = board[move[0]][move[1]]
+    scores = history.setdefault(piece, [0] * 64)
+    sq = move[2] * 8 + move[3]
+    scores[sq] += depth * depth
+    if scores[sq] >= HISTORY_LIMIT:
+        for table in history.values():
+            for i in range(64):
+                table[i] >>= 1
+
+def count_node():
+    """Count a search node and raise SearchTimeout once the budget is spent"""
+    global search_nodes
+    search_nodes += 1
+    if search_nodes == search_node_limit:
+        raise SearchTimeout
+    if search_nodes & 255 == 0 and (time.perf_counter() >= search_deadline or
+                                    (search_stop is not None and search_stop.is_set())):
+        raise SearchTimeout
+
+def quiescence(alpha, beta, ply):
+    """Search captures and promotions until the position is quiet.
+
+    The static evaluation is a lower bound ("stand pat") unless the side to
+    move is in check, in which case every evasion is searched. Captures
+    that lose material by static exchange are skipped.
+    """
+    count_node()
+    color = "w" if turn == "white" else "b"
+    in_check = is_in_check(color)
+    if in_check:
+        moves = get_moves(color)
+        if not moves:
+            return -(MATE_SCORE - ply)
+        best_score = -MATE_SCORE - 1
+    else:
+        best_score = relative_evaluate()
+        if best_score >= beta or ply >= MAX_PLY - 1:
+            return best_score
+        alpha = max(alpha, best_score)
+        scores = {}
+        for m in legal_moves(color):
+            piece = board[m[0]][m[1]]
+            victim = captured_piece(m)
+            if victim:
+                if SEE_VALUES[victim[1]] < SEE_VALUES[piece[1]] and see(m) < 0:
+                    continue
+                scores[m] = 10 * SEE_VALUES[victim[1]] - SEE_VALUES[piece[1]] // 10
+            elif piece[1] == "p" and m[2] in (0, 7):
+                scores[m] = SEE_VALUES["q"]
+        moves = sorted(scores, key=scores.__getitem__, reverse=True)
+    if in_check:
+        order_moves(moves, None, ply)
+
+    for m in moves:
+        make_move(m)
+        try:
+            score = -quiescence(-beta, -alpha, ply + 1)
+        finally:
+            unmake_move()
+        if score > best_score:
+            best_score = score
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+    return best_score
+
+def negamax(depth, alpha, beta, ply):
+    """Alpha-beta search returning the score for the side to move"""
+    # Any repetition inside the tree is scored as the draw it can be forced into
+    if reversible_plies >= 100 or (reversible_plies >= 4 and repetitions()) or (
+            eval_phase <= 2 and insufficient_material()):
+        return 0
+    if depth <= 0:
+        return quiescence(alpha, beta, ply)
+    count_node()
+
+    key = position_hash
+    tt_move = None
+    entry = tt_probe(key)
+    if entry:
+        tt_depth, bound, tt_score, tt_move = entry
+        if tt_depth >= depth:
+            tt_score = score_from_tt(tt_score, ply)
+            if (bound == TT_EXACT or (bound == TT_LOWER and tt_score >= beta) or
+                    (bound == TT_UPPER and tt_score <= alpha)):
+                return tt_score
+
+    color = "w" if turn == "white" else "b"
+    moves = get_moves(color)
+    if not moves:
+        return -(MATE_SCORE - ply) if is_in_check(color) else 0
+
+    order_moves(moves, tt_move, ply)
+
+    original_alpha = alpha
+    best_score, best_move = -MATE_SCORE - 1, None
+    for m in moves:
+        make_move(m)
+        try:
+            score = -negamax(depth - 1, -beta, -alpha, ply + 1)
+        finally:
+            unmake_move()
+        if score > best_score:
+            best_score, best_move = score, m
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    if not captured_piece(m):
+                        record_cutoff(m, depth, ply)
+                    break
+
+    if best_score >= beta:
+        bound = TT_LOWER
+    elif best_score > original_alpha:
+        bound = TT_EXACT
+    else:
+        bound = TT_UPPER
+    tt_store(key, depth, bound, score_to_tt(best_score, ply), best_move)
+    return best_score
+
+def search(time_limit=None, node_limit=None, max_depth=None, stop_event=None):
+    """Iterative deepening search for the side to move.
+
+    Returns the best move of the last fully completed depth, or of the
+    interrupted one if not even depth 1 finished within the budget. Setting
+    stop_event (e.g. a threading or multiprocessing Event) ends the search
+    the same way as running out of time.
+    """
+    global search_nodes, search_deadline, search_node_limit, search_stop, last_search
+    start = time.perf_counter()
+    search_deadline = start + (AI_TIME_LIMIT if time_limit is None else time_limit)
+    search_node_limit = AI_NODE_LIMIT if node_limit is None else node_limit
+    search_stop = stop_event
+    search_nodes = 0
+    if not tt_keys:
+        tt_resize(tt_size_mb)
+    tt_new_search()
+    clear_move_ordering()
+
+    moves = get_moves("w" if turn == "white" else "b")
+    if not moves:
+        return None
+    entry = tt_probe(position_hash)
+    order_moves(moves, entry[3] if entry else None, 0)
+    best_move, best_score, completed = moves[0], 0, 0
+    iterations = []  # Nodes searched by each completed depth
+
+    for depth in range(1, (max_depth or AI_MAX_DEPTH) + 1):
+        iteration_start = search_nodes
+        alpha = -MATE_SCORE - 1
+        iteration_best = None
+        try:
+            for m in moves:
+                make_move(m)
+                try:
+                    score = -negamax(depth - 1, -MATE_SCORE - 1, -alpha, 1)
+                finally:
+                    unmake_move()
+                if score > alpha:
+                    alpha, iteration_best = score, m
+        except SearchTimeout:
+            if completed == 0 and iteration_best:
+                best_move, best_score = iteration_best, alpha
+            break
+
+        best_move, best_score, completed = iteration_best, alpha, depth
+        iterations.append(search_nodes - iteration_start)
+        tt_store(position_hash, depth, TT_EXACT, best_score, best_move)
+        # Search the best move first on the next iteration
+        moves.remove(best_move)
+        moves.insert(0, best_move)
+        if abs(best_score) >= MATE_SCORE - depth:
+            break
+
+    last_search = {"depth": completed, "score": best_score, "nodes": search_nodes,
+                   "time": time.perf_counter() - start, "iterations": iterations}
+    return best_move
+
+def choose_move(time_limit=None, node_limit=None, stop_event=None):
+    """Pick the AI move for the side to move without playing it"""
+    global last_search
+    if endgame_tables is not None:
+        start = time.perf_counter()
+        move = endgame_tables.choose()
+        if move:
+            last_search = {"depth": 0, "score": endgame_tables.probe(), "nodes": 0,
+                           "time": time.perf_counter() - start, "tablebase": True}
+            return move
+    if opening_book is not None:
+        move = opening_book.choose()
+        if move:
+            last_search = {"depth": 0, "score": 0, "nodes": 0, "time": 0.0, "book": True}
+            return move
+    if AI_MODE == "easy":
+        return easy_move()
+    return search(time_limit, node_limit, stop_event=stop_event)
+
+def ai_move(time_limit=None, node_limit=None):
+    """AI makes a move for the side to move and returns the move coordinates"""
+    best_move = choose_move(time_limit, node_limit)
+    if best_move:
+        make_move(best_move)
+    return best_move
@@ -0,0 +1,113 @@
+"""Run engine searches in a background process so the GUI never blocks.
+
+    worker = EngineWorker(book_path="book.bin", tables_path="egtb.bin")  # Both optional
+    request_id = worker.request(engine.get_position(), time_limit=1.0)
+    ...
+    reply = worker.poll()      # None until the search finishes
+    worker.cancel()            # abandon the current request
+    worker.close()
+
+Each reply is (request_id, move, search_info). Replies for cancelled or
+superseded requests are dropped by poll(). While worker.instrument is set,
+the worker runs with stats enabled and search_info["stats"] holds the
+stats.snapshot() of that request.
+"""
+import multiprocessing
+import queue
+import sys
+
+import book
+import egtb
+import engine
+import stats
+
+class _Cancelled:
+    """Event-like stop flag for one request: set once its id has been cancelled"""
+
+    def __init__(self, cancelled, request_id):
+        self.cancelled = cancelled
+        self.request_id = request_id
+
+    def is_set(self):
+        return self.cancelled.value >= self.request_id
+
+def _serve(requests, replies, cancelled, book_path, tables_path):
+    """Worker process loop: one search per request until None arrives"""
+    if book_path:
+        book.use_book(book_path)
+    if tables_path:
+        try:
+            egtb.use_tables(tables_path)
+        except ValueError as e:
+            print(f"Endgame tables not used: {e}", file=sys.stderr)  # Keep searching without them
+    while True:
+        job = requests.get()
+        if job is None:
+            break
+        request_id, position, time_limit, instrument = job
+        if request_id <= cancelled.value:
+            continue  # Cancelled while queued, nobody wants the reply
+        if instrument and not stats.enabled:
+            stats.enable()
+        elif stats.enabled and not instrument:
+            stats.disable()
+        stats.reset()
+        engine.set_position(*position)
+        move = engine.choose_move(time_limit, stop_event=_Cancelled(cancelled, request_id))
+        info = dict(engine.last_search)
+        if instrument:
+            info["stats"] = stats.snapshot()
+        replies.put((request_id, move, info))
+
+class EngineWorker:
+    """A single background search process with a request/cancel protocol"""
+
+    def __init__(self, book_path=None, tables_path=None):
+        ctx = multiprocessing.get_context("spawn")
+        self.requests = ctx.Queue()
+        self.replies = ctx.Queue()
+        self.cancelled = ctx.Value("q", 0)  # Highest request id the worker must abandon
+        self.process = ctx.Process(target=_serve,
+                                   args=(self.requests, self.replies, self.cancelled, book_path, tables_path),
+                                   daemon=True)
+        self.process.start()
+        self.last_id = 0
+        self.pending = None  # Id of the request whose reply we still want
+        self.instrument = False  # Collect stats in the worker, see stats.py
+
+    @property
+    def thinking(self):
+        return self.pending is not None
+
+    def request(self, position, time_limit=None):
+        """Ask for the best move in position; any pending request is cancelled"""
+        self.cancel()
+        self.last_id += 1
+        self.pending = self.last_id
+        self.requests.put((self.pending, position, time_limit, self.instrument))
+        return self.pending
+
+    def cancel(self):
+        """Stop the running search and ignore its reply"""
+        if self.pending is not None:
+            self.cancelled.value = self.pending
+            self.pending = None
+
+    def poll(self):
+        """Return (request_id, move, info) for the pending request, or None"""
+        while self.pending is not None:
+            try:
+                reply = self.replies.get_nowait()
+            except queue.Empty:
+                return None
+            if reply[0] == self.pending:
+                self.pending = None
+                return reply
+        return None
+
+    def close(self):
+        self.cancel()
+        self.requests.put(None)
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.terminate()
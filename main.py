@@ -1,13 +1,22 @@
 import pygame
+import argparse
+import os
 import sys
+import time
 
-pygame.init()
+import engine
+import stats
+from engine_worker import EngineWorker
 
 # ---------------- WINDOW ----------------
+# The window is resizable; WIDTH and HEIGHT are the board's size within it,
+# and layout() recomputes them and SQ whenever the window changes size.
 WIDTH, HEIGHT = 720, 720
 SQ = WIDTH // 8
-WIN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Chess Game")
+DEFAULT_SQ = SQ  # Square size the font sizes below are given for
+MIN_SQ = 40
+WIN = None  # Created by init_display()
+windowed_size = (WIDTH, HEIGHT)  # Restored when leaving full screen
 
 # ---------------- COLORS (IMPROVED WOODEN STYLE) ----------------
 LIGHT = (240, 217, 181)
@@ -17,585 +26,421 @@ MOVE = (173, 216, 230)  # Light blue for valid moves (like in image)
 MOVE_OVERLAY = (173, 216, 230, 180)  # Semi-transparent overlay
 CHECK = (255, 0, 0)  # Red for check indication
 
-# ---------------- LOAD PIECES ----------------
-pieces = {}
+# ---------------- PIECE ATLAS ----------------
+# All twelve sprites side by side in one surface. The PNGs are read once, on
+# the first draw, into a master atlas; atlases for the current square size
+# are scaled from it and cached, so resizing never touches the disk.
 names = ["wp","wr","wn","wb","wq","wk","bp","br","bn","bb","bq","bk"]
-for n in names:
-    pieces[n] = pygame.transform.scale(
-        pygame.image.load(f"pieces/{n}.png").convert_alpha(),
-        (SQ - 8, SQ - 8)
-    )
-
-# ---------------- BOARD (Starting position) ----------------
-# Rank 8 (index 0) to Rank 1 (index 7)
-# Files: a(0), b(1), c(2), d(3), e(4), f(5), g(6), h(7)
-board = [
-    ["br","bn","bb","bq","bk","bb","bn","br"],  # Rank 8
-    ["bp","bp","bp","bp","bp","bp","bp","bp"],  # Rank 7
-    ["","","","","","","",""],                   # Rank 6
-    ["","","","","","","",""],                   # Rank 5
-    ["","","","","","","",""],                   # Rank 4
-    ["","","","","","","",""],                   # Rank 3
-    ["wp","wp","wp","wp","wp","wp","wp","wp"],  # Rank 2
-    ["wr","wn","wb","wq","wk","wb","wn","wr"]   # Rank 1
-]
-
-turn = "white"
+SPRITE_INDEX = {n: i for i, n in enumerate(names)}
+MASTER_SIZE = 256  # Sprite size kept in memory; enough for a full-screen board
+ATLAS_CACHE_SIZE = 4
+
+master_atlas = None
+atlases = {}  # Sprite size -> atlas surface
+
+def load_master_atlas():
+    atlas = pygame.Surface((MASTER_SIZE * len(names), MASTER_SIZE), pygame.SRCALPHA)
+    for i, n in enumerate(names):
+        sprite = pygame.image.load(f"pieces/{n}.png").convert_alpha()
+        atlas.blit(pygame.transform.smoothscale(sprite, (MASTER_SIZE, MASTER_SIZE)), (i * MASTER_SIZE, 0))
+    return atlas
+
+def piece_atlas(size):
+    """Atlas of size x size sprites, built on first use"""
+    global master_atlas
+    atlas = atlases.get(size)
+    if atlas is None:
+        if master_atlas is None:
+            master_atlas = load_master_atlas()
+        atlas = pygame.transform.smoothscale(master_atlas, (size * len(names), size))
+        if len(atlases) >= ATLAS_CACHE_SIZE:
+            del atlases[next(iter(atlases))]
+        atlases[size] = atlas
+    return atlas
+
+# ---------------- DISPLAY ----------------
+def init_display():
+    """Open the window and lay out the board; sprites load on the first draw"""
+    global WIN
+    pygame.init()
+    WIN = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
+    pygame.display.set_caption("Chess Game")
+    layout(WIDTH, HEIGHT)
+
+def layout(width, height):
+    """Fit the board to a width x height window and rebuild what depends on the square size"""
+    global WIDTH, HEIGHT, SQ, board_layer
+    SQ = max(min(width, height) // 8, MIN_SQ)
+    WIDTH = HEIGHT = 8 * SQ
+    for name, size in (("label", 24), ("status", 36), ("thinking", 28), ("stats", 22)):
+        fonts[name] = pygame.font.Font(None, max(size * SQ // DEFAULT_SQ, 14))
+    overlays[LAST_MOVE] = make_overlay(MOVE, 180)
+    overlays[SELECTED] = make_overlay(SELECT, 180)
+    overlays[DESTINATION] = make_overlay(MOVE, 180)
+    overlays[IN_CHECK] = make_overlay(CHECK, 150)  # Semi-transparent red
+    board_layer = build_board_layer()
+    banner_cache.clear()
+    WIN.fill((0, 0, 0))  # Margins the board does not cover
+    pygame.display.flip()
+    invalidate_screen()
+
+def toggle_fullscreen():
+    global WIN, windowed_size
+    if WIN.get_flags() & pygame.FULLSCREEN:
+        WIN = pygame.display.set_mode(windowed_size, pygame.RESIZABLE)
+    else:
+        windowed_size = WIN.get_size()
+        WIN = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+    layout(*WIN.get_size())
+
+# ---------------- GUI STATE ----------------
 selected = None
 last_move = None  # Track last move for highlighting
-game_state = "playing"  # "playing", "check", "checkmate", "stalemate"
-en_passant_target = None  # (row, col) of pawn that can be captured en passant
-castling_rights = {"w": {"kingside": True, "queenside": True}, 
-                   "b": {"kingside": True, "queenside": True}}
+redo_stack = []  # Moves taken back with undo_turn() that can be replayed
+worker = None  # Background search process, started by main()
+BOOK_FILE = "book.bin"  # Opening book for the AI, used when the file exists
+TABLES_FILE = "egtb.bin"  # Endgame tables for the AI, used when the file exists
+show_stats = False  # F3 toggles the FPS / engine statistics panel
+request_time = None  # When the pending AI request was sent
+clock = None
 
 # ---------------- DRAW ----------------
-def draw_board():
+# Squares and coordinate labels are rendered into board_layer by layout(). Each
+# frame only squares whose piece or highlight changed are redrawn, and only
+# their rectangles are sent to display.update().
+LAST_MOVE, SELECTED, DESTINATION, IN_CHECK = 1, 2, 4, 8  # Square highlight bits
+
+board_layer = None
+fonts = {}
+overlays = {}
+banner_cache = {}  # (text, color) -> rendered banner surface
+drawn_squares = {}  # (r, c) -> (piece, highlights) currently on screen
+drawn_banners = {}  # Banner name -> (surface, rect) currently on screen
+drawn_frame = None  # Everything the last frame depended on
+
+def make_overlay(color, alpha):
+    overlay = pygame.Surface((SQ, SQ), pygame.SRCALPHA)
+    overlay.fill((*color[:3], alpha))
+    return overlay
+
+def build_board_layer():
+    """Render the squares and coordinate labels into an off-screen surface"""
+    layer = pygame.Surface((WIDTH, HEIGHT))
     for r in range(8):
         for c in range(8):
             color = LIGHT if (r + c) % 2 == 0 else DARK
-            pygame.draw.rect(WIN, color, (c*SQ, r*SQ, SQ, SQ))
+            pygame.draw.rect(layer, color, (c*SQ, r*SQ, SQ, SQ))
     
     # Draw file labels (a-h)
-    font = pygame.font.Font(None, 24)
+    font = fonts["label"]
     for c in range(8):
         label = chr(ord('a') + c)
         text = font.render(label, True, (0, 0, 0) if c % 2 == 0 else (255, 255, 255))
-        WIN.blit(text, (c*SQ + SQ - 20, HEIGHT - 25))
+        layer.blit(text, (c*SQ + SQ - 20, HEIGHT - 25))
     
     # Draw rank labels (1-8)
     for r in range(8):
         label = str(8 - r)
         color = (0, 0, 0) if (r + 0) % 2 == 0 else (255, 255, 255)
         text = font.render(label, True, color)
-        WIN.blit(text, (5, r*SQ + 5))
-
-def draw_pieces():
-    for r in range(8):
-        for c in range(8):
-            piece = board[r][c]
-            if piece:
-                WIN.blit(pieces[piece], (c*SQ + 4, r*SQ + 4))
-
-def draw_check_indicator():
-    """Draw red highlight on king in check"""
-    if game_state == "check" or game_state == "checkmate":
-        current_color = "w" if turn == "white" else "b"
-        king_pos = find_king(current_color)
+        layer.blit(text, (5, r*SQ + 5))
+    return layer
+
+def render_banner(text, color, font_name, padding):
+    """Text on a black box with a grey border, cached by text and color"""
+    key = (text, color, font_name)
+    if key not in banner_cache:
+        text_surface = fonts[font_name].render(text, True, color)
+        w, h = text_surface.get_size()
+        banner = pygame.Surface((w + 2 * padding[0], h + 2 * padding[1]))
+        banner.fill((0, 0, 0))
+        pygame.draw.rect(banner, (50, 50, 50), banner.get_rect(), 2)
+        banner.blit(text_surface, padding)
+        banner_cache[key] = banner
+    return banner_cache[key]
+
+def square_highlights():
+    """Highlight bits per square for the current selection, last move and check"""
+    marks = {}
+    if last_move:
+        sr, sc, er, ec = last_move
+        marks[(sr, sc)] = LAST_MOVE
+        marks[(er, ec)] = LAST_MOVE
+
+    if selected and engine.game_state not in engine.GAME_OVER_STATES:
+        marks[selected] = marks.get(selected, 0) | SELECTED
+        for square in engine.legal_destinations(*selected):
+            marks[square] = marks.get(square, 0) | DESTINATION
+
+    if engine.game_state == "check" or engine.game_state == "checkmate":
+        king_pos = engine.find_king("w" if engine.turn == "white" else "b")
         if king_pos:
-            kr, kc = king_pos
-            overlay = pygame.Surface((SQ, SQ), pygame.SRCALPHA)
-            overlay.fill((*CHECK[:3], 150))  # Semi-transparent red
-            WIN.blit(overlay, (kc*SQ, kr*SQ))
-
-def draw_game_status():
-    """Display game status text"""
-    font = pygame.font.Font(None, 36)
+            marks[king_pos] = marks.get(king_pos, 0) | IN_CHECK
+    return marks
+
+DRAW_REASONS = {"repetition": "THREEFOLD REPETITION", "fifty_moves": "FIFTY-MOVE RULE",
+                "insufficient_material": "INSUFFICIENT MATERIAL"}
+
+def current_banners():
+    """Game status text at the top and the AI thinking indicator at the bottom"""
+    banners = {}
     status_text = ""
     color = (255, 255, 255)
     
-    if game_state == "check":
+    if engine.game_state == "check":
         status_text = "CHECK!"
         color = (255, 200, 0)
-    elif game_state == "checkmate":
-        winner = "Black" if turn == "white" else "White"
+    elif engine.game_state == "checkmate":
+        winner = "Black" if engine.turn == "white" else "White"
         status_text = f"CHECKMATE! {winner} Wins!"
         color = (255, 0, 0)
-    elif game_state == "stalemate":
+    elif engine.game_state == "stalemate":
         status_text = "STALEMATE - Draw!"
         color = (200, 200, 200)
+    elif engine.game_state in engine.DRAW_STATES:
+        status_text = f"{DRAW_REASONS[engine.game_state]} - Draw!"
+        color = (200, 200, 200)
     
     if status_text:
-        text_surface = font.render(status_text, True, color)
-        text_rect = text_surface.get_rect(center=(WIDTH // 2, 30))
-        # Draw background for text
-        bg_rect = pygame.Rect(text_rect.x - 10, text_rect.y - 5, 
-                              text_rect.width + 20, text_rect.height + 10)
-        pygame.draw.rect(WIN, (0, 0, 0), bg_rect)
-        pygame.draw.rect(WIN, (50, 50, 50), bg_rect, 2)
-        WIN.blit(text_surface, text_rect)
-
-# ---------------- MOVE LOGIC ----------------
-def path_clear(sr, sc, er, ec):
-    dr = er - sr
-    dc = ec - sc
-    if dr == 0 and dc == 0:
-        return False
-    step_r = (dr > 0) - (dr < 0) if dr != 0 else 0
-    step_c = (dc > 0) - (dc < 0) if dc != 0 else 0
-    r, c = sr + step_r, sc + step_c
-    while (r, c) != (er, ec):
-        if board[r][c] != "":
-            return False
-        r += step_r
-        c += step_c
-    return True
-
-def find_king(color):
-    """Find the position of the king for the given color"""
-    for r in range(8):
-        for c in range(8):
-            piece = board[r][c]
-            if piece and piece[0] == color and piece[1] == "k":
-                return (r, c)
-    return None
-
-def is_in_check(color):
-    """Check if the king of the given color is in check"""
-    king_pos = find_king(color)
-    if not king_pos:
-        return False
-    kr, kc = king_pos
-    opponent = "b" if color == "w" else "w"
-    
-    # Check if any opponent piece can attack the king
-    for r in range(8):
-        for c in range(8):
-            piece = board[r][c]
-            if piece and piece[0] == opponent:
-                if valid_move_without_check(r, c, kr, kc):
-                    return True
-    return False
-
-def valid_move_without_check(sr, sc, er, ec):
-    """Check if move is valid without considering check (used internally)"""
-    piece = board[sr][sc]
-    if not piece:
-        return False
-
-    target = board[er][ec]
-    if target and target[0] == piece[0]:
-        return False
-
-    dr, dc = er - sr, ec - sc
-
-    # PAWN
-    if piece[1] == "p":
-        direction = -1 if piece[0] == "w" else 1
-        start_row = 6 if piece[0] == "w" else 1
-
-        # one step
-        if dc == 0 and dr == direction and target == "":
-            return True
-
-        # two steps on first move
-        if (sr == start_row and dc == 0 and
-            dr == 2 * direction and
-            board[sr + direction][sc] == "" and
-            target == ""):
-            return True
-
-        # capture
-        if abs(dc) == 1 and dr == direction and target != "":
-            return True
-        
-        # En passant
-        if en_passant_target and (er, ec) == en_passant_target:
-            if abs(dc) == 1 and dr == direction:
-                return True
-
-    # ROOK
-    if piece[1] == "r" and (sr == er or sc == ec):
-        return path_clear(sr, sc, er, ec)
-
-    # BISHOP
-    if piece[1] == "b" and abs(dr) == abs(dc):
-        return path_clear(sr, sc, er, ec)
-
-    # QUEEN
-    if piece[1] == "q":
-        if sr == er or sc == ec or abs(dr) == abs(dc):
-            return path_clear(sr, sc, er, ec)
-
-    # KNIGHT
-    if piece[1] == "n":
-        return (abs(dr), abs(dc)) in [(1,2),(2,1)]
-
-    # KING
-    if piece[1] == "k":
-        # Normal king move
-        if abs(dr) <= 1 and abs(dc) <= 1:
-            return True
-        # Castling
-        if abs(dc) == 2 and dr == 0 and sr in [0, 7]:
-            return can_castle(piece[0], sr, sc, er, ec)
-
-    return False
-
-def can_castle(color, kr, kc, er, ec):
-    """Check if castling is legal"""
-    # King must not have moved
-    if not castling_rights[color]["kingside"] and not castling_rights[color]["queenside"]:
-        return False
-    
-    # King must not be in check
-    if is_in_check(color):
-        return False
-    
-    # Determine which side
-    if ec > kc:  # Kingside
-        if not castling_rights[color]["kingside"]:
-            return False
-        rook_col = 7
-        squares_between = [(kr, 5), (kr, 6)]
-    else:  # Queenside
-        if not castling_rights[color]["queenside"]:
-            return False
-        rook_col = 0
-        squares_between = [(kr, 1), (kr, 2), (kr, 3)]
-    
-    # Check if rook exists and hasn't moved
-    if board[kr][rook_col] != (color + "r"):
-        return False
-    
-    # Check if squares between are empty
-    for r, c in squares_between:
-        if board[r][c] != "":
-            return False
-    
-    # Check if king passes through check
-    # King moves from kc to ec, so check squares between
-    step = 1 if ec > kc else -1
-    king_path = []
-    for col in range(kc + step, ec + step, step):
-        king_path.append((kr, col))
-    
-    for r, c in king_path:
-        # Temporarily move king
-        backup = board[r][c]
-        board[r][c] = color + "k"
-        board[kr][kc] = ""
-        in_check = is_in_check(color)
-        board[kr][kc] = color + "k"
-        board[r][c] = backup
-        if in_check:
-            return False
-    
-    return True
-
-def valid_move(sr, sc, er, ec):
-    """Check if move is valid, including check prevention"""
-    piece = board[sr][sc]
-    if not piece:
-        return False
-
-    # First check basic move validity
-    if not valid_move_without_check(sr, sc, er, ec):
-        return False
-    
-    # Handle special moves
-    color = piece[0]
-    
-    # En passant capture
-    en_passant_capture = False
-    if piece[1] == "p" and en_passant_target and (er, ec) == en_passant_target:
-        en_passant_capture = True
-        captured_pawn_row = sr  # Pawn being captured is on same row
-        captured_pawn_col = ec
-    
-    # Castling
-    castling_move = False
-    if piece[1] == "k" and abs(ec - sc) == 2:
-        castling_move = True
-        rook_start_col = 7 if ec > sc else 0
-        rook_end_col = 5 if ec > sc else 3
-    
-    # Make the move temporarily to check if it leaves own king in check
-    backup_target = board[er][ec]
-    backup_en_passant = None
-    if en_passant_capture:
-        backup_en_passant = board[captured_pawn_row][captured_pawn_col]
-        board[captured_pawn_row][captured_pawn_col] = ""
-    
-    if castling_move:
-        # Move rook for castling check
-        board[er][rook_end_col] = board[sr][rook_start_col]
-        board[sr][rook_start_col] = ""
-    
-    board[er][ec] = board[sr][sc]
-    board[sr][sc] = ""
-    
-    # Check if this move leaves own king in check
-    in_check = is_in_check(color)
-    
-    # Restore the board
-    board[sr][sc] = board[er][ec]
-    board[er][ec] = backup_target
-    if en_passant_capture:
-        board[captured_pawn_row][captured_pawn_col] = backup_en_passant
-    if castling_move:
-        board[sr][rook_start_col] = board[er][rook_end_col]
-        board[er][rook_end_col] = ""
-    
-    # Move is invalid if it leaves own king in check
-    return not in_check
-
-# ---------------- PAWN PROMOTION ----------------
-def promote_pawn():
-    for c in range(8):
-        if board[0][c] == "wp":
-            board[0][c] = "wq"
-        if board[7][c] == "bp":
-            board[7][c] = "bq"
-
-# ---------------- AI (EASY MODE) ----------------
-def evaluate():
-    values = {"p":1,"n":3,"b":3,"r":5,"q":9,"k":100}
-    score = 0
+        banner = render_banner(status_text, color, "status", (10, 5))
+        banners["status"] = (banner, banner.get_rect(center=(WIDTH // 2, 30)))
+
+    if worker is not None and worker.thinking:
+        dots = "." * (pygame.time.get_ticks() // 300 % 4)
+        banner = render_banner(f"AI thinking{dots}", (255, 255, 255), "thinking", (10, 7))
+        banners["thinking"] = (banner, banner.get_rect(topleft=(8, HEIGHT - 64)))
+
+    if show_stats:
+        panel = render_stats_panel(stats_lines())
+        banners["stats"] = (panel, panel.get_rect(bottomright=(WIDTH - 8, HEIGHT - 34)))
+    return banners
+
+def stats_lines():
+    """Text of the statistics panel: frame rate and the last AI search"""
+    frame = stats.timers.get("frame")
+    frame_ms = 1000 * frame["total"] / frame["count"] if frame else 0
+    lines = [f"FPS {clock.get_fps():.0f}   frame {frame_ms:.1f} ms avg"]
+    if stats.searches:
+        s = stats.searches[-1]
+        branching = f"{s['branching_factor']:.1f}" if s["branching_factor"] else "-"
+        lines.append(f"depth {s['depth']}   {s['nodes']:,} nodes   {s['nps']:,.0f} n/s")
+        lines.append(f"TT hits {s['tt_hit_rate']:.0%}   EBF {branching}")
+    latency = stats.timers.get("ai_latency")
+    if latency:
+        lines.append(f"AI reply {latency['total'] / latency['count']:.2f}s avg, "
+                     f"{latency['max']:.2f}s max")
+    return lines
+
+def render_stats_panel(lines):
+    """Lines of small text on a black box with a grey border"""
+    surfaces = [fonts["stats"].render(line, True, (200, 255, 200)) for line in lines]
+    w = max(s.get_width() for s in surfaces) + 16
+    h = sum(s.get_height() + 2 for s in surfaces) + 10
+    panel = pygame.Surface((w, h))
+    panel.fill((0, 0, 0))
+    pygame.draw.rect(panel, (50, 50, 50), panel.get_rect(), 2)
+    y = 6
+    for s in surfaces:
+        panel.blit(s, (8, y))
+        y += s.get_height() + 2
+    return panel
+
+def squares_under(rect):
+    rows = range(max(rect.top // SQ, 0), min((rect.bottom - 1) // SQ, 7) + 1)
+    cols = range(max(rect.left // SQ, 0), min((rect.right - 1) // SQ, 7) + 1)
+    return [(r, c) for r in rows for c in cols]
+
+def draw_square(r, c, piece, marks):
+    rect = pygame.Rect(c*SQ, r*SQ, SQ, SQ)
+    WIN.blit(board_layer, rect, rect)
+    for bit in (LAST_MOVE, SELECTED, DESTINATION):
+        if marks & bit:
+            WIN.blit(overlays[bit], rect)
+    if piece:
+        size = SQ - 8
+        WIN.blit(piece_atlas(size), (c*SQ + 4, r*SQ + 4), (SPRITE_INDEX[piece] * size, 0, size, size))
+    if marks & IN_CHECK:
+        WIN.blit(overlays[IN_CHECK], rect)
+    return rect
+
+def invalidate_screen():
+    """Force the next render() to repaint the whole window"""
+    global drawn_frame
+    drawn_frame = None
+    drawn_squares.clear()
+    drawn_banners.clear()
+
+def render():
+    """Redraw what changed since the last frame and update only those rectangles"""
+    global drawn_frame
+    thinking_dots = pygame.time.get_ticks() // 300 % 4 if worker and worker.thinking else None
+    stats_tick = pygame.time.get_ticks() // 250 if show_stats else None  # Panel refresh rate
+    frame = (engine.position_hash, selected, last_move, engine.game_state, thinking_dots, stats_tick)
+    if frame == drawn_frame:
+        return
+    drawn_frame = frame
+
+    marks = square_highlights()
+    banners = current_banners()
+    dirty = set()
     for r in range(8):
+        row = engine.board[r]
         for c in range(8):
-            if board[r][c]:
-                v = values[board[r][c][1]]
-                score += v if board[r][c][0] == "b" else -v
-    return score
+            if drawn_squares.get((r, c)) != (row[c], marks.get((r, c), 0)):
+                dirty.add((r, c))
+    # Squares under a banner that moved, changed or disappeared need repainting
+    for name in drawn_banners.keys() | banners.keys():
+        if drawn_banners.get(name) != banners.get(name):
+            for banner in (drawn_banners.get(name), banners.get(name)):
+                if banner:
+                    dirty.update(squares_under(banner[1]))
+
+    rects = []
+    for r, c in dirty:
+        contents = (engine.board[r][c], marks.get((r, c), 0))
+        rects.append(draw_square(r, c, *contents))
+        drawn_squares[(r, c)] = contents
+    for name, (banner, rect) in banners.items():
+        if rect.collidelist(rects) != -1:
+            WIN.blit(banner, rect)
+    drawn_banners.clear()
+    drawn_banners.update(banners)
+
+    if rects:
+        pygame.display.update(rects)
 
-def get_moves(color):
-    moves = []
-    for r in range(8):
-        for c in range(8):
-            if board[r][c] and board[r][c][0] == color:
-                for er in range(8):
-                    for ec in range(8):
-                        if valid_move(r, c, er, ec):
-                            moves.append((r, c, er, ec))
-    return moves
-
-def update_game_state():
-    """Update game state (check, checkmate, stalemate)"""
-    global game_state
-    current_color = "w" if turn == "white" else "b"
-    opponent_color = "b" if turn == "white" else "w"
-    
-    # Check if current player is in check
-    in_check = is_in_check(current_color)
-    
-    # Get all legal moves for current player
-    legal_moves = get_moves(current_color)
-    
-    if in_check:
-        if len(legal_moves) == 0:
-            game_state = "checkmate"
-        else:
-            game_state = "check"
+# ---------------- MAIN LOOP ----------------
+def apply_ai_reply():
+    """Play the worker's move once its search has finished"""
+    global last_move
+    reply = worker.poll()
+    if reply:
+        move, info = reply[1], reply[2]
+        if stats.enabled:
+            stats.record_time("ai_latency", time.perf_counter() - request_time)
+            if "stats" in info:
+                stats.merge(info["stats"])
+        if move:
+            engine.make_move(move)
+            last_move = move
+
+def undo_turn():
+    """Take back the AI reply and the player's move before it"""
+    global last_move, selected
+    worker.cancel()
+    while engine.undo_stack:
+        redo_stack.append(engine.unmake_move())
+        if engine.turn == "white":
+            break
+    last_move = engine.undo_stack[-1][0] if engine.undo_stack else None
+    selected = None
+    resume_ai()
+
+def redo_turn():
+    """Replay moves taken back with undo_turn"""
+    global last_move, selected
+    while redo_stack:
+        engine.make_move(redo_stack.pop())
+        if engine.turn == "white":
+            break
+    last_move = engine.undo_stack[-1][0] if engine.undo_stack else None
+    selected = None
+    resume_ai()
+
+def resume_ai():
+    """Ask for the AI reply when undo or redo left Black to move in a game still going"""
+    engine.update_game_state()
+    if engine.turn == "black" and engine.game_state not in engine.GAME_OVER_STATES:
+        request_ai_move()
+
+def request_ai_move():
+    global request_time
+    request_time = time.perf_counter()
+    worker.request(engine.get_position(), engine.AI_TIME_LIMIT)
+
+def set_stats(enabled):
+    """Turn instrumentation on or off here and in the worker"""
+    if enabled:
+        stats.enable()
     else:
-        if len(legal_moves) == 0:
-            game_state = "stalemate"
-        else:
-            game_state = "playing"
-
-def ai_move():
-    """AI makes a move and returns the move coordinates"""
-    global en_passant_target
-    best_score = -9999
-    best_move = None
-
-    moves = get_moves("b")
-    if not moves:
-        return None
-
-    for m in moves:
-        sr, sc, er, ec = m
-        piece = board[sr][sc]
-        
-        # Handle en passant for evaluation
-        en_passant_backup = None
-        if piece[1] == "p" and en_passant_target and (er, ec) == en_passant_target:
-            captured_row = sr
-            captured_col = ec
-            en_passant_backup = board[captured_row][captured_col]
-            board[captured_row][captured_col] = ""
-        
-        # Handle castling for evaluation
-        castling_rook = None
-        if piece[1] == "k" and abs(ec - sc) == 2:
-            rook_start_col = 7 if ec > sc else 0
-            rook_end_col = 5 if ec > sc else 3
-            castling_rook = (sr, rook_start_col, rook_end_col)
-            board[er][rook_end_col] = board[sr][rook_start_col]
-            board[sr][rook_start_col] = ""
-        
-        backup = board[er][ec]
-        board[er][ec] = board[sr][sc]
-        board[sr][sc] = ""
-        score = evaluate()   # EASY AI
-        board[sr][sc] = board[er][ec]
-        board[er][ec] = backup
-        
-        if castling_rook:
-            r, rs, re = castling_rook
-            board[r][rs] = board[r][re]
-            board[r][re] = ""
-        
-        if en_passant_backup is not None:
-            board[sr][ec] = en_passant_backup
-
-        if score > best_score:
-            best_score = score
-            best_move = m
-
-    if best_move:
-        sr, sc, er, ec = best_move
-        piece = board[sr][sc]
-        
-        # Handle en passant
-        if piece[1] == "p" and en_passant_target and (er, ec) == en_passant_target:
-            captured_row = sr
-            captured_col = ec
-            board[captured_row][captured_col] = ""
-        
-        # Handle castling
-        if piece[1] == "k" and abs(ec - sc) == 2:
-            rook_start_col = 7 if ec > sc else 0
-            rook_end_col = 5 if ec > sc else 3
-            board[er][rook_end_col] = board[sr][rook_start_col]
-            board[sr][rook_start_col] = ""
-            castling_rights["b"]["kingside"] = False
-            castling_rights["b"]["queenside"] = False
-        
-        # Update castling rights
-        if piece[1] == "k":
-            castling_rights["b"]["kingside"] = False
-            castling_rights["b"]["queenside"] = False
-        if piece[1] == "r":
-            if sc == 0:
-                castling_rights["b"]["queenside"] = False
-            elif sc == 7:
-                castling_rights["b"]["kingside"] = False
-        
-        board[er][ec] = board[sr][sc]
-        board[sr][sc] = ""
-        
-        # Set en passant target
-        en_passant_target = None
-        if piece[1] == "p" and abs(er - sr) == 2:
-            en_passant_target = (sr + (er - sr) // 2, ec)
-        
-        return (sr, sc, er, ec)
-    return None
+        stats.disable()
+    worker.instrument = enabled
 
-# ---------------- MAIN LOOP ----------------
 def main():
-    global selected, turn, last_move, game_state, en_passant_target, castling_rights
+    global WIN, selected, last_move, worker, clock, show_stats
+    parser = argparse.ArgumentParser(description="Play chess against the engine")
+    parser.add_argument("--stats", metavar="FILE",
+                        help="collect engine statistics and write them to FILE as JSON on exit")
+    args = parser.parse_args()
+
+    init_display()
+    worker = EngineWorker(BOOK_FILE if os.path.exists(BOOK_FILE) else None,
+                          TABLES_FILE if os.path.exists(TABLES_FILE) else None)
     clock = pygame.time.Clock()
+    if args.stats:
+        set_stats(True)
 
     while True:
         clock.tick(60)
-        draw_board()
+        if stats.enabled:
+            stats.record_time("frame", clock.get_rawtime() / 1000)  # Work time, without the wait
+        apply_ai_reply()
 
         # Update game state
-        update_game_state()
-
-        # Highlight last move (like in the image - f6 and h8)
-        if last_move:
-            sr, sc, er, ec = last_move
-            # Create a semi-transparent surface for overlay
-            overlay = pygame.Surface((SQ, SQ), pygame.SRCALPHA)
-            overlay.fill((*MOVE[:3], 180))  # Add alpha channel
-            WIN.blit(overlay, (sc*SQ, sr*SQ))
-            WIN.blit(overlay, (ec*SQ, er*SQ))
-
-        # Highlight selected piece and valid moves (square highlighting like in image)
-        if selected and game_state not in ["checkmate", "stalemate"]:
-            r, c = selected
-            # Highlight selected piece
-            overlay = pygame.Surface((SQ, SQ), pygame.SRCALPHA)
-            overlay.fill((*SELECT[:3], 180))
-            WIN.blit(overlay, (c*SQ, r*SQ))
-            
-            # Highlight valid move squares (like in image)
-            for er in range(8):
-                for ec in range(8):
-                    if valid_move(r, c, er, ec):
-                        overlay = pygame.Surface((SQ, SQ), pygame.SRCALPHA)
-                        overlay.fill((*MOVE[:3], 180))  # Add alpha channel
-                        WIN.blit(overlay, (ec*SQ, er*SQ))
-
-        draw_pieces()
-        draw_check_indicator()
-        draw_game_status()
+        engine.update_game_state()
+        render()
 
         for e in pygame.event.get():
             if e.type == pygame.QUIT:
+                worker.close()
                 pygame.quit()
+                if args.stats:
+                    stats.export(args.stats)
                 sys.exit()
 
-            if e.type == pygame.MOUSEBUTTONDOWN and turn == "white" and game_state not in ["checkmate", "stalemate"]:
+            if e.type == pygame.WINDOWEXPOSED:
+                invalidate_screen()
+            elif e.type == pygame.VIDEORESIZE:
+                WIN = pygame.display.get_surface()
+                layout(e.w, e.h)
+
+            if e.type == pygame.KEYDOWN:
+                ctrl = e.mod & pygame.KMOD_CTRL
+                if e.key == pygame.K_LEFT or (ctrl and e.key == pygame.K_z):
+                    undo_turn()
+                elif e.key == pygame.K_RIGHT or (ctrl and e.key == pygame.K_y):
+                    redo_turn()
+                elif e.key == pygame.K_F11:
+                    toggle_fullscreen()
+                elif e.key == pygame.K_F3:
+                    show_stats = not show_stats
+                    # Keep collecting while exporting to a file
+                    set_stats(show_stats or bool(args.stats))
+
+            if (e.type == pygame.MOUSEBUTTONDOWN and engine.turn == "white" and not worker.thinking and
+                    engine.game_state not in engine.GAME_OVER_STATES):
                 x, y = pygame.mouse.get_pos()
                 # Don't process clicks on the label area
-                if y < HEIGHT - 30 and x < WIDTH - 30:
+                margin = 30 * SQ // DEFAULT_SQ
+                if y < HEIGHT - margin and x < WIDTH - margin:
                     r, c = y // SQ, x // SQ
 
                     if selected:
                         sr, sc = selected
-                        piece = board[sr][sc]
-                        if valid_move(sr, sc, r, c):
-                            # Handle en passant
-                            en_passant_captured = False
-                            if piece[1] == "p" and en_passant_target and (r, c) == en_passant_target:
-                                captured_row = sr
-                                captured_col = c
-                                board[captured_row][captured_col] = ""
-                                en_passant_captured = True
-                            
-                            # Handle castling
-                            if piece[1] == "k" and abs(c - sc) == 2:
-                                rook_start_col = 7 if c > sc else 0
-                                rook_end_col = 5 if c > sc else 3
-                                board[r][rook_end_col] = board[r][rook_start_col]
-                                board[r][rook_start_col] = ""
-                                castling_rights[piece[0]]["kingside"] = False
-                                castling_rights[piece[0]]["queenside"] = False
-                            
-                            # Update castling rights
-                            if piece[1] == "k":
-                                castling_rights[piece[0]]["kingside"] = False
-                                castling_rights[piece[0]]["queenside"] = False
-                            if piece[1] == "r":
-                                if sc == 0:
-                                    castling_rights[piece[0]]["queenside"] = False
-                                elif sc == 7:
-                                    castling_rights[piece[0]]["kingside"] = False
-                            
-                            # Make the move
-                            board[r][c] = board[sr][sc]
-                            board[sr][sc] = ""
+                        if (r, c) in engine.legal_destinations(sr, sc):
+                            engine.make_move((sr, sc, r, c))
+                            redo_stack.clear()
                             last_move = (sr, sc, r, c)
                             
-                            # Set en passant target if pawn moved two squares
-                            en_passant_target = None
-                            if piece[1] == "p" and abs(r - sr) == 2:
-                                en_passant_target = (sr + (r - sr) // 2, c)
-                            
-                            promote_pawn()
-                            
                             # Update game state before AI move
-                            update_game_state()
+                            engine.update_game_state()
                             
-                            if game_state not in ["checkmate", "stalemate"]:
-                                turn = "black"
-                                ai_move_result = ai_move()
-                                if ai_move_result:
-                                    last_move = ai_move_result
-                                    # Update AI castling rights
-                                    ai_piece = board[ai_move_result[2]][ai_move_result[3]]
-                                    if ai_piece[1] == "k":
-                                        castling_rights["b"]["kingside"] = False
-                                        castling_rights["b"]["queenside"] = False
-                                    if ai_piece[1] == "r":
-                                        if ai_move_result[1] == 0:
-                                            castling_rights["b"]["queenside"] = False
-                                        elif ai_move_result[1] == 7:
-                                            castling_rights["b"]["kingside"] = False
-                                    # Clear en passant after AI move
-                                    en_passant_target = None
-                                promote_pawn()
-                                turn = "white"
+                            if engine.game_state not in engine.GAME_OVER_STATES:
+                                request_ai_move()
                         selected = None
                     else:
-                        if board[r][c] and board[r][c][0] == "w":
+                        if engine.board[r][c] and engine.board[r][c][0] == "w":
                             selected = (r, c)
 
-        pygame.display.update()
-
-main()
-
-
+if __name__ == "__main__":
+    main()
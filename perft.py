@@ -0,0 +1,127 @@
+"""Perft: count the leaf nodes of the legal move tree to check and time move generation.
+
+    python perft.py 4                            # start position, depth 4
+    python perft.py 3 --fen "<FEN>" --divide     # per-move breakdown
+    python perft.py --suite                      # reference positions
+    python perft.py --suite --bitboard           # same, on the bitboard backend
+
+Pawns always promote to a queen in this game, so the suite only uses
+positions and depths whose published counts contain no promotions.
+"""
+import argparse
+import sys
+import time
+
+import bitboard
+import engine
+
+# (name, FEN, {depth: expected leaf nodes})
+REFERENCE_POSITIONS = [
+    ("start position", engine.START_FEN,
+     {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     {1: 48, 2: 2039, 3: 97862}),
+    ("en passant and pins", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ("castling rights", "r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1", {4: 1274206}),
+    ("castling prevented", "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1", {4: 1720476}),
+    ("short castling gives check", "5k2/8/8/8/8/8/8/4K2R w K - 0 1", {6: 661072}),
+    ("long castling gives check", "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1", {6: 803711}),
+    ("double check", "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1", {4: 23527}),
+]
+
+# ---------------- ENGINE BACKEND ----------------
+def perft(depth):
+    """Leaf nodes below the current engine position"""
+    if depth == 0:
+        return 1
+    moves = engine.get_moves("w" if engine.turn == "white" else "b")
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for m in moves:
+        engine.make_move(m)
+        nodes += perft(depth - 1)
+        engine.unmake_move()
+    return nodes
+
+def divide(depth):
+    """(move name, leaf nodes) for every legal move of the current position"""
+    results = []
+    for m in engine.get_moves("w" if engine.turn == "white" else "b"):
+        engine.make_move(m)
+        results.append((engine.move_name(m), perft(depth - 1)))
+        engine.unmake_move()
+    return results
+
+# ---------------- BITBOARD BACKEND ----------------
+def current_bitboards():
+    return bitboard.from_board(engine.board, engine.turn, engine.castling_rights,
+                               engine.en_passant_target)
+
+def bitboard_perft(depth):
+    return bitboard.perft(current_bitboards(), depth)
+
+def bitboard_divide(depth):
+    pos = current_bitboards()
+    return [(engine.move_name(bitboard.move_coords(m)), bitboard.perft(bitboard.make_move(pos, m), depth - 1))
+            for m in bitboard.legal_moves(pos)]
+
+# ---------------- CLI ----------------
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def report(nodes, elapsed):
+    nps = nodes / elapsed if elapsed > 0 else 0
+    return f"{nodes} nodes in {elapsed:.2f}s ({nps:,.0f} nodes/s)"
+
+def run_suite(count, max_nodes):
+    """Check every reference count up to max_nodes; return the number of failures"""
+    failures = 0
+    total_nodes = total_time = 0
+    for name, fen, expected in REFERENCE_POSITIONS:
+        engine.load_fen(fen)
+        for depth, want in sorted(expected.items()):
+            if want > max_nodes:
+                continue
+            nodes, elapsed = timed(count, depth)
+            total_nodes += nodes
+            total_time += elapsed
+            status = "ok  " if nodes == want else "FAIL"
+            if nodes != want:
+                failures += 1
+            print(f"{status} {name} depth {depth}: {report(nodes, elapsed)}"
+                  + ("" if nodes == want else f", expected {want}"))
+    print(f"Total: {report(total_nodes, total_time)}, {failures} failed")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Count perft leaf nodes from a FEN position")
+    parser.add_argument("depth", type=int, nargs="?", default=3)
+    parser.add_argument("--fen", default=engine.START_FEN)
+    parser.add_argument("--divide", action="store_true", help="print the node count below each move")
+    parser.add_argument("--suite", action="store_true", help="check the reference positions")
+    parser.add_argument("--max-nodes", type=int, default=1000000,
+                        help="skip suite entries expected to exceed this many nodes")
+    parser.add_argument("--bitboard", action="store_true", help="use the bitboard move generator")
+    args = parser.parse_args()
+
+    count = bitboard_perft if args.bitboard else perft
+    if args.suite:
+        sys.exit(1 if run_suite(count, args.max_nodes) else 0)
+
+    engine.load_fen(args.fen)
+    if args.divide:
+        results, elapsed = timed(bitboard_divide if args.bitboard else divide, args.depth)
+        for name, nodes in sorted(results):
+            print(f"{name}: {nodes}")
+        print(f"Moves: {len(results)}")
+        nodes = sum(n for _, n in results)
+    else:
+        nodes, elapsed = timed(count, args.depth)
+    print(f"Depth {args.depth}: {report(nodes, elapsed)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Compact, immutable position snapshots packed into 34 bytes.
+
+    pos = Position.from_engine()        # snapshot the live engine state
+    seen = {pos}                        # hashes and compares as bytes
+    pos.load()                          # make it the live engine state again
+    Position.from_fen(fen).fen()
+
+Layout:
+    bytes 0-31  two squares per byte, square r * 8 + c; the even square in
+                the high nibble. 0 = empty, i + 1 = bitboard.PIECES[i]
+    byte 32     bit 0 set when Black is to move, bits 1-4 castling rights
+    byte 33     en passant file + 1, or 0
+
+A Position is a bytes subclass without a __dict__, so a snapshot costs one
+object of about 80 bytes instead of the board's nine lists. It holds what
+identifies a position (placement, side to move, castling rights and en
+passant square) and leaves out the move counters, so equal positions
+compare equal whatever their history.
+"""
+import bitboard
+import engine
+
+SIZE = 34
+NIBBLE = {"": 0, **{p: i + 1 for i, p in enumerate(bitboard.PIECES)}}
+PIECE = [""] + bitboard.PIECES
+
+class Position(bytes):
+    """Immutable 34-byte snapshot of a position"""
+    __slots__ = ()
+
+    def __new__(cls, data):
+        if len(data) != SIZE:
+            raise ValueError(f"A Position is {SIZE} bytes, got {len(data)}")
+        return super().__new__(cls, data)
+
+    @classmethod
+    def pack(cls, board, turn="white", castling_rights=15, en_passant_target=None):
+        """Build from the arguments engine.set_position() takes"""
+        flat = [NIBBLE[piece] for row in board for piece in row]
+        data = bytearray(flat[i] << 4 | flat[i + 1] for i in range(0, 64, 2))
+        data.append((turn == "black") | castling_rights << 1)
+        data.append(en_passant_target[1] + 1 if en_passant_target else 0)
+        return cls(data)
+
+    @classmethod
+    def from_engine(cls):
+        return cls.pack(engine.board, engine.turn, engine.castling_rights, engine.en_passant_target)
+
+    @classmethod
+    def from_fen(cls, fen):
+        return cls.pack(*engine.parse_fen(fen)[:4])
+
+    # ---------------- FIELDS ----------------
+    @property
+    def turn(self):
+        return "black" if self[32] & 1 else "white"
+
+    @property
+    def castling_rights(self):
+        return self[32] >> 1
+
+    @property
+    def en_passant_target(self):
+        if not self[33]:
+            return None
+        # The captured pawn just made its double step, so the row follows from the side to move
+        return (2 if self[32] & 1 == 0 else 5, self[33] - 1)
+
+    def piece_at(self, r, c):
+        sq = r * 8 + c
+        byte = self[sq >> 1]
+        return PIECE[byte & 15 if sq & 1 else byte >> 4]
+
+    @property
+    def board(self):
+        """The placement as a new 8 x 8 engine-style board"""
+        squares = []
+        for byte in self[:32]:
+            squares.append(PIECE[byte >> 4])
+            squares.append(PIECE[byte & 15])
+        return [squares[r * 8:r * 8 + 8] for r in range(8)]
+
+    # ---------------- CONVERSION ----------------
+    def unpack(self):
+        """(board, turn, castling_rights, en_passant_target) for engine.set_position()"""
+        return self.board, self.turn, self.castling_rights, self.en_passant_target
+
+    def load(self, halfmove_clock=0, fullmove_number=1, history=()):
+        """Make this the live engine position; history is engine.repetition_history()"""
+        engine.set_position(*self.unpack(), halfmove_clock, fullmove_number, history)
+
+    def fen(self, halfmove_clock=0, fullmove_number=1):
+        rights = "".join(ch for ch, bit in engine.FEN_CASTLING.items() if self.castling_rights & bit) or "-"
+        ep = engine.square_name(*self.en_passant_target) if self.en_passant_target else "-"
+        return (f"{engine.placement_fen(self.board)} {self.turn[0]} {rights} {ep} "
+                f"{halfmove_clock} {fullmove_number}")
+
+    def __repr__(self):
+        return f"Position.from_fen({self.fen()!r})"
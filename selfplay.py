@@ -0,0 +1,185 @@
+"""Self-play: engine-vs-engine games in a process pool, streamed to a PGN file.
+
+    python selfplay.py 100                          # 100 games, 0.1s per move
+    python selfplay.py 1000 --nodes 20000 --time 0  # fixed node budget per move
+    python selfplay.py 50 --openings openings.txt --pgn out.pgn --workers 8
+    python selfplay.py 100 --book book.bin          # book moves first, then search
+    python selfplay.py 100 --tables egtb.bin        # perfect play in KQK, KRK and KPK
+
+Each opening is a line of coordinate moves from the start position, such as
+"e2e4 e7e5 g1f3"; blank lines and lines starting with # are skipped. Game i
+starts from opening i modulo the number of openings. Every finished game is
+appended to the PGN file straight away, so memory use does not grow with the
+number of games. Games end at checkmate or a draw by rule (stalemate,
+threefold repetition, the fifty-move rule, insufficient material); those
+still running after --max-plies half-moves are adjudicated as draws.
+"""
+import argparse
+import collections
+import datetime
+import multiprocessing
+import os
+import time
+
+import book
+import egtb
+import engine
+
+# Short, balanced lines so games with the same budget do not all repeat
+OPENINGS = [
+    "e2e4 e7e5 g1f3 b8c6",
+    "e2e4 c7c5 g1f3 d7d6",
+    "e2e4 e7e6 d2d4 d7d5",
+    "e2e4 c7c6 d2d4 d7d5",
+    "d2d4 d7d5 c2c4 e7e6",
+    "d2d4 g8f6 c2c4 g7g6",
+    "c2c4 e7e5 b1c3 g8f6",
+    "g1f3 d7d5 g2g3 g8f6",
+]
+
+RESULTS = ("1-0", "1/2-1/2", "0-1")
+
+# ---------------- GAME ----------------
+def init_worker(book_path, tables_path):
+    if book_path:
+        book.use_book(book_path)
+    if tables_path:
+        egtb.use_tables(tables_path)
+
+def play_game(job):
+    """Play one game in a pool process; returns its result, SAN moves and search totals"""
+    game_number, opening, time_limit, node_limit, max_plies = job
+    engine.load_fen(engine.START_FEN)
+    san_moves = []
+    nodes = search_time = 0
+    termination = "normal"
+
+    for name in opening.split():
+        move = engine.parse_move(name)
+        if move not in engine.get_moves("w" if engine.turn == "white" else "b"):
+            raise ValueError(f"Illegal opening move {name!r} in {opening!r}")
+        san_moves.append(engine.move_san(move))
+        engine.make_move(move)
+
+    while True:
+        engine.update_game_state()
+        if engine.game_state in engine.GAME_OVER_STATES:
+            break
+        if len(san_moves) >= max_plies:
+            termination = "adjudication"
+            break
+        move = engine.choose_move(time_limit, node_limit)
+        nodes += engine.last_search.get("nodes", 0)
+        search_time += engine.last_search.get("time", 0)
+        san_moves.append(engine.move_san(move))
+        engine.make_move(move)
+
+    if engine.game_state == "checkmate":
+        result = "0-1" if engine.turn == "white" else "1-0"
+    else:
+        result = "1/2-1/2"
+    ending = engine.game_state if termination == "normal" else "ply limit"
+    return {"game": game_number, "opening": opening, "result": result, "termination": termination,
+            "ending": ending, "moves": san_moves, "nodes": nodes, "search_time": search_time}
+
+# ---------------- PGN ----------------
+def format_pgn(game, date):
+    """PGN text for a finished game, move text wrapped at 80 columns"""
+    tags = [("Event", "Self-play"), ("Site", "?"), ("Date", date), ("Round", str(game["game"])),
+            ("White", "engine"), ("Black", "engine"), ("Result", game["result"]),
+            ("Opening", game["opening"]), ("Termination", game["termination"]),
+            ("PlyCount", str(len(game["moves"])))]
+    lines = [f'[{name} "{value}"]' for name, value in tags]
+    lines.append("")
+
+    tokens = []
+    for i, san in enumerate(game["moves"]):
+        if i % 2 == 0:
+            tokens.append(f"{i // 2 + 1}.")
+        tokens.append(san)
+    tokens.append(game["result"])
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 80:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n\n"
+
+# ---------------- CLI ----------------
+def load_openings(path):
+    if path is None:
+        return OPENINGS
+    with open(path) as f:
+        openings = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if not openings:
+        raise SystemExit(f"No openings in {path}")
+    return openings
+
+def print_stats(games, wall_time):
+    """Aggregate results, game length and search speed"""
+    count = len(games)
+    tally = {result: sum(g["result"] == result for g in games) for result in RESULTS}
+    plies = sum(g["plies"] for g in games)
+    nodes = sum(g["nodes"] for g in games)
+    search_time = sum(g["search_time"] for g in games)
+    endings = collections.Counter(g["ending"] for g in games if g["result"] == "1/2-1/2")
+
+    print(f"Games: {count} in {wall_time:.1f}s")
+    print(f"White wins / draws / Black wins: {tally['1-0']} / {tally['1/2-1/2']} / {tally['0-1']}")
+    if endings:
+        print("Draws: " + ", ".join(f"{n} {ending.replace('_', ' ')}" for ending, n in endings.most_common()))
+    if count:
+        print(f"Average length: {plies / count:.1f} plies")
+    nps = nodes / search_time if search_time > 0 else 0
+    print(f"Searched {nodes:,} nodes at {nps:,.0f} nodes/s per process")
+
+def main():
+    parser = argparse.ArgumentParser(description="Play engine-vs-engine games and write them to PGN")
+    parser.add_argument("games", type=int, nargs="?", default=10)
+    parser.add_argument("--time", type=float, default=0.1,
+                        help="seconds per move, 0 for no time limit (default 0.1)")
+    parser.add_argument("--nodes", type=int, default=None, help="node budget per move")
+    parser.add_argument("--openings", help="file with one opening per line, in coordinate moves")
+    parser.add_argument("--pgn", default="selfplay.pgn", help="output file (default selfplay.pgn)")
+    parser.add_argument("--book", help="opening book to play from before searching")
+    parser.add_argument("--tables", help="endgame tables to play from instead of searching")
+    parser.add_argument("--max-plies", type=int, default=300,
+                        help="adjudicate a draw after this many half-moves (default 300)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="processes to play in parallel (default: all cores)")
+    args = parser.parse_args()
+    if args.time <= 0 and args.nodes is None:
+        parser.error("--time 0 needs a --nodes budget")
+    if args.tables:
+        # Check the file here: a pool initializer that raises would be restarted forever
+        try:
+            egtb.Tables(args.tables).close()
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+
+    openings = load_openings(args.openings)
+    time_limit = args.time if args.time > 0 else float("inf")
+    jobs = [(i + 1, openings[i % len(openings)], time_limit, args.nodes, args.max_plies)
+            for i in range(args.games)]
+    date = datetime.date.today().strftime("%Y.%m.%d")
+
+    start = time.perf_counter()
+    summaries = []
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(args.workers, init_worker, (args.book, args.tables)) as pool, open(args.pgn, "a") as out:
+        for game in pool.imap_unordered(play_game, jobs):
+            out.write(format_pgn(game, date))
+            out.flush()
+            # Keep only what the statistics need, not the move lists
+            summaries.append({"result": game["result"], "ending": game["ending"],
+                              "plies": len(game["moves"]), "nodes": game["nodes"],
+                              "search_time": game["search_time"]})
+            print(f"Game {game['game']}: {game['result']} ({game['ending'].replace('_', ' ')}) "
+                  f"in {len(game['moves'])} plies")
+    print_stats(summaries, time.perf_counter() - start)
+
+if __name__ == "__main__":
+    main()
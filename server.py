@@ -0,0 +1,391 @@
+"""Asyncio game server: many concurrent games against a shared pool of engine processes.
+
+    python server.py serve --port 8765 --workers 4       # run the server
+    python server.py demo --games 200 --plies 16         # local client stand-in
+
+The protocol is JSON lines over TCP. Every request may carry an "id" that
+is echoed in its reply, so a client can pipeline requests for many games
+over one connection. Games belong to the connection that created them.
+
+    {"cmd": "new", "color": "white", "fen": "<optional FEN>"}
+        -> {"ok": true, "game": 7, "fen": "...", "state": "playing", "reply": null}
+    {"cmd": "move", "game": 7, "move": "e2e4", "time": 0.2}
+        -> {"ok": true, "move": "e2e4", "reply": "e7e5", "fen": "...", "state": "playing"}
+    {"cmd": "state", "game": 7}
+    {"cmd": "close", "game": 7}
+    {"cmd": "status"}  -> {"ok": true, "games": 1200, "queued": 5, "max_queued": 64}
+    errors -> {"ok": false, "error": "..."}
+
+"reply" is the engine's answer when it is its turn. Moves are coordinate
+notation ("e7e8" promotes to a queen); SAN such as "Nf3" is also accepted.
+Engine searches run in a process pool with one search per worker at a
+time; at most --max-queued searches may be running or waiting, beyond
+which requests fail with "server busy" rather than queue without bound.
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+import traceback
+
+import book
+import engine
+from position import Position
+
+# ---------------- ENGINE PROCESSES ----------------
+def init_worker(book_path):
+    if book_path:
+        book.use_book(book_path)
+
+def search_position(data, halfmove_clock, fullmove_number, history, time_limit):
+    """Runs in a pool process: the engine move for a packed position, or None"""
+    Position(data).load(halfmove_clock, fullmove_number, history)
+    move = engine.choose_move(time_limit)
+    return engine.move_name(move) if move else None
+
+# ---------------- SESSIONS ----------------
+class Session:
+    """One game: the current position, move counters and the hashes it can repeat"""
+    __slots__ = ("position", "halfmove_clock", "fullmove_number", "history", "engine_color", "state",
+                 "busy")
+
+    def __init__(self, position, halfmove_clock, fullmove_number, engine_color):
+        self.position = position
+        self.halfmove_clock = halfmove_clock
+        self.fullmove_number = fullmove_number
+        self.history = ()  # engine.repetition_history(), cleared by every irreversible move
+        self.engine_color = engine_color
+        self.state = "playing"
+        self.busy = False  # An engine search for this game is pending
+
+    def load(self):
+        """Make this game the live engine position"""
+        self.position.load(self.halfmove_clock, self.fullmove_number, self.history)
+
+    def save(self):
+        """Take the live engine position back into the session"""
+        self.position = Position.from_engine()
+        self.halfmove_clock = engine.halfmove_clock()
+        self.fullmove_number = engine.fullmove_number()
+        self.history = tuple(engine.repetition_history())
+        engine.update_game_state()
+        self.state = engine.game_state
+
+    def snapshot(self):
+        """Everything save() changes, for restore()"""
+        return self.position, self.halfmove_clock, self.fullmove_number, self.history, self.state
+
+    def restore(self, saved):
+        self.position, self.halfmove_clock, self.fullmove_number, self.history, self.state = saved
+
+    def engine_to_move(self):
+        return self.state not in engine.GAME_OVER_STATES and self.position.turn == self.engine_color
+
+    def fen(self):
+        return self.position.fen(self.halfmove_clock, self.fullmove_number)
+
+class RequestError(Exception):
+    """A request that cannot be served; its message goes back to the client"""
+
+# ---------------- SERVER ----------------
+class GameServer:
+    """Sessions per connection, engine searches through a shared process pool"""
+
+    def __init__(self, workers, max_queued, default_time, max_time, book_path=None):
+        ctx = multiprocessing.get_context("spawn")
+        self.pool = concurrent.futures.ProcessPoolExecutor(workers, ctx, init_worker, (book_path,))
+        self.slots = asyncio.Semaphore(workers)  # Searches handed to the pool at once
+        self.max_queued = max_queued
+        self.queued = 0  # Searches running or waiting for a slot
+        self.default_time = default_time
+        self.max_time = max_time
+        self.game_ids = itertools.count(1)
+        self.games = 0  # Open sessions over all connections
+
+    def check_capacity(self):
+        """Refuse a request that would need a search when the queue is full.
+
+        Called before a request changes anything, so a refused move is not
+        half played.
+        """
+        if self.queued >= self.max_queued:
+            raise RequestError("server busy")
+
+    async def engine_move(self, session, time_limit):
+        """Ask the pool for the engine move and play it in the session"""
+        self.check_capacity()
+        self.queued += 1
+        session.busy = True
+        try:
+            async with self.slots:
+                name = await asyncio.get_running_loop().run_in_executor(
+                    self.pool, search_position, bytes(session.position),
+                    session.halfmove_clock, session.fullmove_number, session.history, time_limit)
+        finally:
+            self.queued -= 1
+            session.busy = False
+        if name:
+            session.load()
+            engine.make_move(engine.parse_move(name))
+            session.save()
+        return name
+
+    def time_limit(self, request):
+        seconds = request.get("time", self.default_time)
+        if not isinstance(seconds, (int, float)) or seconds <= 0:
+            raise RequestError("time must be a positive number of seconds")
+        return min(seconds, self.max_time)
+
+    # ---------------- COMMANDS ----------------
+    async def cmd_new(self, games, request):
+        color = request.get("color", "white")
+        if color not in ("white", "black"):
+            raise RequestError("color must be white or black")
+        time_limit = self.time_limit(request)
+        fen = request.get("fen", engine.START_FEN)
+        if not isinstance(fen, str):
+            raise RequestError("fen must be a string")
+        try:
+            engine.load_fen(fen)
+        except ValueError as e:
+            raise RequestError(str(e)) from None
+        session = Session(Position.from_engine(), engine.halfmove_clock(), engine.fullmove_number(),
+                          "black" if color == "white" else "white")
+        session.save()
+        # The game only exists once the engine's first move, if any, has been played
+        reply = await self.engine_move(session, time_limit) if session.engine_to_move() else None
+        game_id = next(self.game_ids)
+        games[game_id] = session
+        self.games += 1
+        return {"game": game_id, "fen": session.fen(), "state": session.state, "reply": reply}
+
+    async def cmd_move(self, games, request):
+        session = self.session(games, request)
+        if session.busy:
+            raise RequestError("engine is still thinking in this game")
+        if session.state in engine.GAME_OVER_STATES:
+            raise RequestError(f"game over ({session.state})")
+        if session.position.turn == session.engine_color:
+            raise RequestError("not your turn")
+        time_limit = self.time_limit(request)
+        text = request.get("move")
+        if not isinstance(text, str):
+            raise RequestError("move must be a string")
+        self.check_capacity()
+        session.load()
+        try:
+            move = engine.parse_move(text)
+            if move not in engine.position_info()["moves"]:
+                raise ValueError(f"Illegal move {text!r}")
+        except ValueError:
+            try:
+                move = engine.parse_san(text)
+            except ValueError as e:
+                raise RequestError(str(e)) from None
+        saved = session.snapshot()
+        engine.make_move(move)
+        session.save()
+        try:
+            reply = await self.engine_move(session, time_limit) if session.engine_to_move() else None
+        except BaseException:
+            session.restore(saved)  # Take the move back so the game can go on
+            raise
+        return {"move": engine.move_name(move), "reply": reply, "fen": session.fen(), "state": session.state}
+
+    async def cmd_state(self, games, request):
+        session = self.session(games, request)
+        return {"fen": session.fen(), "state": session.state, "thinking": session.busy}
+
+    async def cmd_close(self, games, request):
+        self.session(games, request)
+        del games[request["game"]]
+        self.games -= 1
+        return {}
+
+    async def cmd_status(self, games, request):
+        return {"games": self.games, "queued": self.queued, "max_queued": self.max_queued}
+
+    def session(self, games, request):
+        game_id = request.get("game")
+        if not isinstance(game_id, int) or isinstance(game_id, bool):
+            raise RequestError("game must be a game number")
+        session = games.get(game_id)
+        if session is None:
+            raise RequestError("unknown game")
+        return session
+
+    # ---------------- CONNECTIONS ----------------
+    async def handle_request(self, games, line, writer):
+        request = {}
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise RequestError("request must be a JSON object")
+            handler = getattr(self, f"cmd_{request.get('cmd')}", None)
+            if handler is None:
+                raise RequestError(f"unknown command {request.get('cmd')!r}")
+            reply = {"ok": True, **await handler(games, request)}
+        except json.JSONDecodeError:
+            reply = {"ok": False, "error": "bad JSON"}
+        except RequestError as e:
+            reply = {"ok": False, "error": str(e)}
+        except concurrent.futures.BrokenExecutor:
+            reply = {"ok": False, "error": "engine pool failed"}
+        except Exception as e:
+            # Every request gets a reply, or a pipelining client would wait on its id forever
+            print(f"Request {line[:200]!r} failed:", file=sys.stderr)
+            traceback.print_exc()
+            reply = {"ok": False, "error": f"internal error ({type(e).__name__})"}
+        if isinstance(request, dict) and "id" in request:
+            reply["id"] = request["id"]
+        if not writer.is_closing():
+            writer.write(json.dumps(reply).encode() + b"\n")
+            await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        """Serve one client; each request runs as its own task so games never wait on each other"""
+        games = {}
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self.handle_request(games, line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        except ConnectionError:
+            pass
+        finally:
+            # Settle every request first, or a late new game would register on a dead connection
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.games -= len(games)
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=1 << 16)
+        print(f"Serving on {host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+# ---------------- DEMO CLIENT ----------------
+demo_ids = itertools.count(1)
+
+async def demo_game(writer, pending, plies, time_limit, rng, latencies):
+    """Play random legal moves in one game, timing every engine reply"""
+    async def call(request):
+        request_id = next(demo_ids)
+        future = asyncio.get_running_loop().create_future()
+        pending[request_id] = future
+        writer.write(json.dumps({**request, "id": request_id}).encode() + b"\n")
+        await writer.drain()
+        return await future
+
+    reply = await call({"cmd": "new", "color": rng.choice(["white", "black"]), "time": time_limit})
+    if not reply["ok"]:
+        return reply["error"]
+    game, fen, state = reply["game"], reply["fen"], reply["state"]
+    for _ in range(plies):
+        if state in engine.GAME_OVER_STATES:
+            break
+        engine.load_fen(fen)
+        move = rng.choice(engine.get_moves(fen.split()[1]))
+        start = time.perf_counter()
+        reply = await call({"cmd": "move", "game": game, "move": engine.move_name(move), "time": time_limit})
+        if not reply["ok"]:
+            return reply["error"]
+        latencies.append(time.perf_counter() - start)
+        fen, state = reply["fen"], reply["state"]
+    await call({"cmd": "close", "game": game})
+    return None
+
+async def demo(host, port, games, plies, time_limit, connections):
+    """Play games concurrently over a few connections and report reply latency"""
+    rng = random.Random(1)
+    latencies, errors = [], []
+    start = time.perf_counter()
+
+    async def connection(count):
+        reader, writer = await asyncio.open_connection(host, port, limit=1 << 16)
+        pending = {}
+
+        async def read_replies():
+            while line := await reader.readline():
+                reply = json.loads(line)
+                pending.pop(reply["id"]).set_result(reply)
+
+        reading = asyncio.create_task(read_replies())
+        results = await asyncio.gather(*(demo_game(writer, pending, plies, time_limit, rng, latencies)
+                                         for _ in range(count)))
+        errors.extend(error for error in results if error)
+        reading.cancel()
+        writer.close()
+
+    per_connection = [games // connections + (i < games % connections) for i in range(connections)]
+    await asyncio.gather(*(connection(n) for n in per_connection if n))
+    elapsed = time.perf_counter() - start
+
+    print(f"{games} games, {len(latencies)} engine replies in {elapsed:.1f}s "
+          f"({len(latencies) / elapsed:.1f} replies/s)")
+    if latencies:
+        latencies.sort()
+        print(f"Reply latency: median {statistics.median(latencies):.3f}s, "
+              f"95th percentile {latencies[int(0.95 * (len(latencies) - 1))]:.3f}s, "
+              f"max {latencies[-1]:.3f}s")
+    if errors:
+        print(f"{len(errors)} games ended with an error, e.g. {errors[0]!r}")
+
+# ---------------- CLI ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Multi-game chess server and demo client")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the server")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--workers", type=int, default=os.cpu_count(),
+                       help="engine processes (default: all cores)")
+    serve.add_argument("--max-queued", type=int, default=None,
+                       help="engine searches running or waiting before requests are refused "
+                            "(default: 16 per worker)")
+    serve.add_argument("--time", type=float, default=0.2, help="default seconds per engine move")
+    serve.add_argument("--max-time", type=float, default=5.0, help="largest time a client may ask for")
+    serve.add_argument("--book", help="opening book for the engine")
+    client = commands.add_parser("demo", help="play random games against a running server")
+    client.add_argument("--host", default="127.0.0.1")
+    client.add_argument("--port", type=int, default=8765)
+    client.add_argument("--games", type=int, default=100)
+    client.add_argument("--plies", type=int, default=10, help="client moves per game")
+    client.add_argument("--time", type=float, default=0.05, help="engine seconds per move")
+    client.add_argument("--connections", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.command == "demo":
+        asyncio.run(demo(args.host, args.port, args.games, args.plies, args.time, args.connections))
+        return
+
+    async def run():
+        server = GameServer(args.workers, args.max_queued or 16 * args.workers, args.time,
+                            args.max_time, args.book)
+        try:
+            await server.serve(args.host, args.port)
+        finally:
+            server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Instrumentation: call counters, timing histograms and per-search statistics.
+
+    import stats
+    stats.enable()           # wrap the engine hot paths
+    engine.ai_move()
+    print(stats.snapshot()["searches"][-1])
+    stats.export("stats.json")
+    stats.disable()          # put the original functions back
+
+Nothing is wrapped until enable() is called, so a disabled run executes the
+engine's own functions with no instrumentation in the way. enable() swaps
+counting (and, for a few coarse functions, timing) wrappers into the engine
+module namespace, which is where the engine looks up its own calls.
+"""
+import collections
+import functools
+import json
+import time
+
+import engine
+
+# Engine functions whose calls are counted, and those that are also timed
+COUNTED = ("legal_moves", "king_safe_after", "is_in_check", "is_square_attacked", "evaluate",
+           "make_move", "get_moves", "see", "negamax", "quiescence")
+TIMED = ("compute_position_info", "choose_move")
+SEARCH_HISTORY = 1000  # Per-search records kept
+
+enabled = False
+counters = collections.Counter()
+timers = {}  # name -> {"count", "total", "min", "max", "buckets": {log2 of microseconds: count}}
+searches = collections.deque(maxlen=SEARCH_HISTORY)
+originals = {}  # name -> engine function replaced by a wrapper
+
+# ---------------- RECORDING ----------------
+def count(name, n=1):
+    counters[name] += n
+
+def record_time(name, seconds):
+    """Add one sample to the histogram called name"""
+    timer = timers.get(name)
+    if timer is None:
+        timer = timers[name] = {"count": 0, "total": 0.0, "min": seconds, "max": seconds, "buckets": {}}
+    timer["count"] += 1
+    timer["total"] += seconds
+    timer["min"] = min(timer["min"], seconds)
+    timer["max"] = max(timer["max"], seconds)
+    bucket = int(seconds * 1e6).bit_length()  # Bucket b holds samples below 2**b microseconds
+    timer["buckets"][bucket] = timer["buckets"].get(bucket, 0) + 1
+
+# ---------------- WRAPPERS ----------------
+def _counted(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        counters[name] += 1
+        return func(*args, **kwargs)
+    return wrapper
+
+def _timed(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        counters[name] += 1
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record_time(name, time.perf_counter() - start)
+    return wrapper
+
+def _tt_probe(func):
+    @functools.wraps(func)
+    def wrapper(key):
+        counters["tt_probe"] += 1
+        entry = func(key)
+        if entry:
+            counters["tt_hit"] += 1
+        return entry
+    return wrapper
+
+def _search(func):
+    """Record nodes, depth, speed, TT hit rate and branching factor of every search"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        probes, hits = counters["tt_probe"], counters["tt_hit"]
+        start = time.perf_counter()
+        move = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        record_time("search", elapsed)
+        searches.append(search_record(engine.last_search, counters["tt_probe"] - probes,
+                                      counters["tt_hit"] - hits))
+        return move
+    return wrapper
+
+def search_record(info, tt_probes, tt_hits):
+    """Summary of one search from engine.last_search and the TT counters it used"""
+    depth, nodes, seconds = info.get("depth", 0), info.get("nodes", 0), info.get("time", 0)
+    return {"depth": depth, "nodes": nodes, "time": seconds,
+            "nps": nodes / seconds if seconds > 0 else 0,
+            "tt_probes": tt_probes, "tt_hit_rate": tt_hits / tt_probes if tt_probes else 0,
+            # Effective branching factor: the b with b ** depth == nodes
+            "branching_factor": nodes ** (1 / depth) if depth and nodes else None,
+            "iteration_nodes": info.get("iterations", [])}
+
+# ---------------- ENABLE / DISABLE ----------------
+def enable():
+    """Start collecting: swap instrumented wrappers into the engine module"""
+    global enabled
+    if enabled:
+        return
+    wrappers = {name: _counted(name, getattr(engine, name)) for name in COUNTED}
+    wrappers.update({name: _timed(name, getattr(engine, name)) for name in TIMED})
+    wrappers["tt_probe"] = _tt_probe(engine.tt_probe)
+    wrappers["search"] = _search(engine.search)
+    for name, wrapper in wrappers.items():
+        originals[name] = getattr(engine, name)
+        setattr(engine, name, wrapper)
+    enabled = True
+
+def disable():
+    """Stop collecting and restore the engine's own functions; recorded data is kept"""
+    global enabled
+    for name, func in originals.items():
+        setattr(engine, name, func)
+    originals.clear()
+    enabled = False
+
+def reset():
+    counters.clear()
+    timers.clear()
+    searches.clear()
+
+def merge(other):
+    """Add the counters, timers and searches of a snapshot() taken in another process"""
+    counters.update(other["counters"])
+    for name, t in other["timers"].items():
+        timer = timers.get(name)
+        if timer is None:
+            timer = timers[name] = {"count": 0, "total": 0.0, "min": t["min"], "max": t["max"], "buckets": {}}
+        timer["count"] += t["count"]
+        timer["total"] += t["total"]
+        timer["min"] = min(timer["min"], t["min"])
+        timer["max"] = max(timer["max"], t["max"])
+        for label, n in t["histogram_us"].items():
+            bucket = int(label[1:]).bit_length() - 1  # "<2**b" back to b
+            timer["buckets"][bucket] = timer["buckets"].get(bucket, 0) + n
+    searches.extend(other["searches"])
+
+# ---------------- EXPORT ----------------
+def snapshot():
+    """All collected data as plain JSON-compatible values"""
+    return {
+        "counters": dict(counters),
+        "timers": {name: {"count": t["count"], "total": t["total"], "min": t["min"], "max": t["max"],
+                          "mean": t["total"] / t["count"],
+                          "histogram_us": {f"<{2 ** b}": n for b, n in sorted(t["buckets"].items())}}
+                   for name, t in timers.items()},
+        "searches": list(searches),
+    }
+
+def export(path):
+    with open(path, "w") as f:
+        json.dump(snapshot(), f, indent=2)